@@ -0,0 +1,271 @@
+"""Grafo de amizades com listas de adjacência compactas.
+
+O grafo é derivado do campo "amigos" dos registros de usuário e fica em
+memória, compartilhado pelas sessões. Ele é atualizado a cada escrita
+feita pelo storage e salvo em friends_index.json junto com a versão do
+backend, para que a próxima partida não precise varrer todos os usuários.
+As gravações são espaçadas por INTERVALO_GRAVACAO; o que ficar pendente é
+gravado ao fim do intervalo e na saída do processo. Se o arquivo de dados
+mudar por fora, o grafo é reconstruído.
+"""
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+
+import registros
+import storage
+
+INDEX_FILE = "friends_index.json"
+
+# Intervalo mínimo entre gravações do índice em disco (segundos)
+INTERVALO_GRAVACAO = 30
+
+AMIGOS_POR_PAGINA = 50
+PEDIDOS_POR_PAGINA = 20
+
+# Intervalo mínimo entre limpezas de pedidos inválidos do mesmo usuário
+INTERVALO_LIMPEZA = 300
+
+
+def _versao(versao):
+    # Normaliza tuplas/listas para comparar com o que veio do JSON
+    return json.dumps(versao)
+
+
+class FriendGraph:
+    def __init__(self, backend, index_path=INDEX_FILE):
+        self.backend = backend
+        self.index_path = index_path
+        self._lock = threading.RLock()
+        # Uma gravação do índice por vez; adquirido antes de self._lock
+        self._gravacao = threading.Lock()
+        # Listas de amigos em formato compacto (registros.Adjacencia), que
+        # não muda; as escritas posteriores ficam em _alterados (user_id ->
+        # dict ordenado dos amigos) até a próxima gravação do índice, quando
+        # tudo vira uma base nova
+        self._base = None
+        self._alterados = {}
+        self._versao = None
+        self._sujo = False
+        self._gravado_em = 0.0
+        self._timer = None
+        storage.add_write_listener(self._ao_gravar)
+        atexit.register(self.gravar_pendente)
+
+    def _carregar(self):
+        # Chamado com self._lock adquirido
+        atual = _versao(self.backend.version())
+        if self._base is not None and self._versao == atual:
+            return
+        self._alterados = {}
+        try:
+            with open(self.index_path, "r") as f:
+                dados = json.load(f)
+            if dados["versao"] == atual:
+                self._base = registros.Adjacencia.de_dict(dados["adjacencia"])
+                self._versao = atual
+                self._sujo = False
+                return
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        # Reaproveita a tabela de usuários, que já guarda as amizades compactas
+        tabela = registros.tabela(self.backend)
+        self._base = tabela.adjacencia
+        self._versao = _versao(tabela.versao)
+        self._escrever(dict(self._base), self._versao)
+        self._sujo = False
+        self._gravado_em = time.monotonic()
+
+    def _vizinhos(self, user_id):
+        # Chamado com self._lock adquirido, depois de _carregar()
+        alterado = self._alterados.get(user_id)
+        return alterado if alterado is not None else self._base.amigos(user_id)
+
+    def _escrever(self, adjacencia, versao):
+        storage._write_json_atomic(self.index_path, {"versao": versao, "adjacencia": adjacencia})
+
+    def _marcar_sujo(self):
+        # Chamado com self._lock adquirido. A gravação fica sempre com o
+        # timer, para não pesar na escrita que disparou o listener
+        self._sujo = True
+        if self._timer is None:
+            espera = INTERVALO_GRAVACAO - (time.monotonic() - self._gravado_em)
+            self._timer = threading.Timer(max(espera, 0), self.gravar_pendente)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def gravar_pendente(self):
+        """Grava o índice se há alterações ainda não salvas em disco.
+
+        Só a cópia das alterações é feita com self._lock; o índice é escrito
+        e a base nova montada sem ele, enquanto as consultas continuam na base
+        antiga.
+        """
+        with self._gravacao:
+            with self._lock:
+                self._timer = None
+                if not self._sujo or self._base is None:
+                    return
+                base, alterados, versao = self._base, dict(self._alterados), self._versao
+                self._sujo = False
+            adjacencia = dict(base)
+            adjacencia.update((user_id, list(amigos)) for user_id, amigos in alterados.items())
+            self._escrever(adjacencia, versao)
+            nova = registros.Adjacencia.de_dict(adjacencia) if alterados else base
+            with self._lock:
+                self._gravado_em = time.monotonic()
+                if self._base is base:
+                    self._base = nova
+                    # Ficam só as escritas que chegaram durante a gravação
+                    self._alterados = {
+                        user_id: amigos for user_id, amigos in self._alterados.items()
+                        if alterados.get(user_id) is not amigos
+                    }
+
+    def _ao_gravar(self, records, antes, depois):
+        with self._lock:
+            if self._base is None:
+                return
+            if records is None or self._versao != _versao(antes):
+                # Perdemos alguma escrita; reconstrói no próximo acesso
+                self._base = None
+                self._alterados = {}
+                return
+            for user_id, user in records.items():
+                if isinstance(user, dict):
+                    self._alterados[user_id] = dict.fromkeys(user.get("amigos", []))
+            self._versao = _versao(depois)
+            self._marcar_sujo()
+
+    def amigos(self, user_id):
+        with self._lock:
+            self._carregar()
+            return list(self._vizinhos(user_id))
+
+    def total(self, user_id):
+        with self._lock:
+            self._carregar()
+            alterado = self._alterados.get(user_id)
+            return len(alterado) if alterado is not None else self._base.grau(user_id)
+
+    def sao_amigos(self, user_id, outro_id):
+        with self._lock:
+            self._carregar()
+            alterado = self._alterados.get(user_id)
+            return outro_id in alterado if alterado is not None else self._base.contem(user_id, outro_id)
+
+    def pagina(self, user_id, pagina=1, por_pagina=AMIGOS_POR_PAGINA):
+        """Amigos da página (começando em 1), na ordem em que foram adicionados."""
+        if pagina < 1:
+            return []
+        with self._lock:
+            self._carregar()
+            inicio = (pagina - 1) * por_pagina
+            alterado = self._alterados.get(user_id)
+            if alterado is not None:
+                return list(itertools.islice(alterado, inicio, inicio + por_pagina))
+            return self._base.amigos(user_id, inicio, por_pagina)
+
+    def mutuos(self, user_id, outro_id):
+        with self._lock:
+            self._carregar()
+            a = self._vizinhos(user_id)
+            b = self._vizinhos(outro_id)
+            menor, maior = (a, b) if len(a) <= len(b) else (b, a)
+            maior = set(maior)
+            return [amigo for amigo in menor if amigo in maior]
+
+    def amigos_de_amigos(self, user_id, limite=10):
+        """Sugestões: quem não é amigo, ordenado pela quantidade de amigos em comum."""
+        with self._lock:
+            self._carregar()
+            lista = self._vizinhos(user_id)
+            diretos = set(lista)
+            contagem = {}
+            for amigo in lista:
+                for candidato in self._vizinhos(amigo):
+                    if candidato != user_id and candidato not in diretos:
+                        contagem[candidato] = contagem.get(candidato, 0) + 1
+        return sorted(contagem, key=contagem.get, reverse=True)[:limite]
+
+    def nomes(self, user_ids):
+        """Resolve vários ids para username com uma única leitura em lote."""
+        registros = self.backend.get_many(user_ids)
+        return {
+            user_id: user.get("username")
+            for user_id, user in registros.items()
+            if isinstance(user, dict)
+        }
+
+
+_grafo = None
+_grafo_lock = threading.Lock()
+
+
+def aceitar_pedidos(user_id, solicitante_ids):
+    """Aceita vários pedidos de amizade numa única escrita. Devolve os ids aceitos."""
+    import notificacoes
+
+    aceitos = []
+    with storage.get_backend().transaction([user_id, *solicitante_ids]) as records:
+        atual = records[user_id]
+        amigos_atual = set(atual.setdefault("amigos", []))
+        for solicitante_id in solicitante_ids:
+            outro = records.get(solicitante_id)
+            if not isinstance(outro, dict):
+                continue
+            if solicitante_id not in amigos_atual:
+                atual["amigos"].append(solicitante_id)
+                amigos_atual.add(solicitante_id)
+            if user_id not in outro.setdefault("amigos", []):
+                outro["amigos"].append(user_id)
+            aceitos.append(solicitante_id)
+    notificacoes.remover_pedidos(user_id, solicitante_ids)
+    return aceitos
+
+
+def recusar_pedidos(user_id, solicitante_ids):
+    """Remove vários pedidos de amizade da fila de notificações."""
+    import notificacoes
+
+    notificacoes.remover_pedidos(user_id, solicitante_ids)
+
+
+def limpar_pedidos_invalidos(user_id):
+    import notificacoes
+
+    pendentes = notificacoes.pedidos_pendentes(user_id)
+    validos = storage.get_backend().get_many(pendentes)
+    invalidos = [i for i in pendentes if i not in validos]
+    if invalidos:
+        recusar_pedidos(user_id, invalidos)
+
+
+_limpezas = {}
+_limpezas_lock = threading.Lock()
+
+
+def agendar_limpeza(user_id):
+    """Remove em segundo plano pedidos de usuários que não existem mais.
+
+    Roda no máximo uma vez a cada INTERVALO_LIMPEZA por usuário, para que a
+    renderização da caixa de entrada nunca precise gravar nada.
+    """
+    agora = time.monotonic()
+    with _limpezas_lock:
+        if agora - _limpezas.get(user_id, -INTERVALO_LIMPEZA) < INTERVALO_LIMPEZA:
+            return
+        _limpezas[user_id] = agora
+    threading.Thread(target=limpar_pedidos_invalidos, args=(user_id,), daemon=True).start()
+
+
+def grafo():
+    global _grafo
+    if _grafo is None:
+        with _grafo_lock:
+            if _grafo is None:
+                _grafo = FriendGraph(storage.get_backend(), os.environ.get("CALC_FRIENDS_INDEX", INDEX_FILE))
+    return _grafo
@@ -0,0 +1,291 @@
+"""API HTTP/JSON das fórmulas, sem o Streamlit.
+
+Servidor asyncio da biblioteca padrão com HTTP/1.1 e keep-alive. Usa o
+mesmo registro de formulas.py da aba de cálculos, então as validações e
+mensagens de erro são as mesmas da interface.
+
+    python api.py [--host 127.0.0.1] [--porta 8000] [--processos 1]
+
+Rotas:
+    GET  /formulas   lista as fórmulas e suas entradas
+    POST /calcular   {"formula": "Torricelli", "valores": {"v0": 3, "a": 2, "s": 4}}
+
+O corpo do POST também pode ser uma lista desses objetos (lote), ou
+{"formula": ..., "lote": [{...}, {...}]} para várias entradas da mesma
+fórmula. No lote, cada item devolve {"resultado": {...}} ou
+{"erro": "..."} na mesma ordem do pedido.
+
+Corpos grandes (lotes) são processados num pool de processos, para que
+um lote não segure as outras conexões do loop.
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from formulas import FORMULAS, DominioError
+
+MAX_CORPO = int(os.environ.get("CALC_API_MAX_CORPO", 10 * 1024 * 1024))  # bytes
+MAX_LOTE = int(os.environ.get("CALC_API_MAX_LOTE", 10_000))
+TRABALHADORES = int(os.environ.get("CALC_API_TRABALHADORES", os.cpu_count() or 2))
+# Acima disso o JSON e o cálculo vão para o pool (~1 ms de trabalho no loop)
+CORPO_NO_LOOP = 64 * 1024  # bytes
+TEMPO_OCIOSO = float(os.environ.get("CALC_API_TEMPO_OCIOSO", 30))  # segundos
+
+STATUS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+}
+
+
+class PedidoInvalido(ValueError):
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _lista_formulas():
+    return [
+        {
+            "nome": f.nome,
+            "entradas": [{"nome": e.nome, "rotulo": e.rotulo, "unidade": e.unidade} for e in f.entradas],
+        }
+        for f in FORMULAS.values()
+    ]
+
+
+def calcular(nome, valores):
+    """Calcula um item. Devolve {"resultado": ...} ou {"erro": ...}."""
+    if not isinstance(nome, str):
+        return {"erro": "\"formula\" deve ser um texto."}
+    formula = FORMULAS.get(nome)
+    if formula is None:
+        return {"erro": f"Fórmula desconhecida: {nome}"}
+    if not isinstance(valores, dict):
+        return {"erro": "\"valores\" deve ser um objeto."}
+    entradas = {}
+    for entrada in formula.entradas:
+        valor = valores.get(entrada.nome)
+        if valor is None:
+            return {"erro": f"Entrada ausente: {entrada.nome}"}
+        # bool é int em Python, mas não é um número aceitável aqui
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            return {"erro": f"Entrada inválida: {entrada.nome}"}
+        try:
+            numero = float(valor)  # inteiros enormes não cabem num float
+        except OverflowError:
+            return {"erro": f"Entrada inválida: {entrada.nome}"}
+        if not math.isfinite(numero):
+            return {"erro": f"Entrada inválida: {entrada.nome}"}
+        entradas[entrada.nome] = numero
+    try:
+        resultado = formula.calcular(**entradas)
+    except DominioError as e:
+        return {"erro": str(e)}
+    except ZeroDivisionError:
+        return {"erro": "Divisão por zero."}
+    except ArithmeticError:
+        return {"erro": "Resultado fora do intervalo numérico."}
+    # Infinity e NaN não existem em JSON
+    if any(isinstance(v, float) and not math.isfinite(v) for v in resultado.values()):
+        return {"erro": "Resultado fora do intervalo numérico."}
+    return {"resultado": resultado}
+
+
+def responder(corpo):
+    """Processa o JSON de /calcular. Devolve (status, resposta)."""
+    if isinstance(corpo, list):
+        itens = corpo
+    elif isinstance(corpo, dict) and "lote" in corpo:
+        if not isinstance(corpo["lote"], list):
+            raise PedidoInvalido("\"lote\" deve ser uma lista.")
+        itens = [{"formula": corpo.get("formula"), "valores": v} for v in corpo["lote"]]
+    elif isinstance(corpo, dict):
+        resposta = calcular(corpo.get("formula"), corpo.get("valores"))
+        return (422 if "erro" in resposta else 200), resposta
+    else:
+        raise PedidoInvalido("O corpo deve ser um objeto ou uma lista.")
+
+    if len(itens) > MAX_LOTE:
+        raise PedidoInvalido(f"Lote maior que o limite de {MAX_LOTE} itens.", 413)
+    return 200, [
+        calcular(item.get("formula"), item.get("valores")) if isinstance(item, dict)
+        else {"erro": "Cada item deve ser um objeto."}
+        for item in itens
+    ]
+
+
+def _rota(metodo, caminho, corpo):
+    caminho = caminho.split("?", 1)[0]
+    if caminho == "/formulas":
+        if metodo != "GET":
+            raise PedidoInvalido("Use GET.", 405)
+        return 200, _lista_formulas()
+    if caminho == "/calcular":
+        if metodo != "POST":
+            raise PedidoInvalido("Use POST.", 405)
+        try:
+            dados = json.loads(corpo)
+        except (ValueError, RecursionError):
+            # ValueError inclui UnicodeDecodeError, JSONDecodeError e números
+            # inteiros com dígitos demais; RecursionError, aninhamento demais
+            raise PedidoInvalido("JSON inválido.")
+        return responder(dados)
+    raise PedidoInvalido("Rota não encontrada.", 404)
+
+
+def _processar(metodo, caminho, corpo):
+    # Também roda no pool: o status do PedidoInvalido não sobreviveria ao pickle
+    try:
+        return _rota(metodo, caminho, corpo)
+    except PedidoInvalido as e:
+        return e.status, {"erro": str(e)}
+
+
+_pool = None
+
+
+def _get_pool():
+    # Só usado pela thread do loop, então dispensa lock
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=TRABALHADORES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _descartar_pool(pool):
+    # Um pool quebrado (processo morto) recusa tudo; o próximo uso cria outro
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _resposta(status, dados, manter):
+    corpo = json.dumps(dados, ensure_ascii=False).encode()
+    cabecalho = (
+        f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(corpo)}\r\n"
+        f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n"
+    )
+    return cabecalho.encode() + corpo
+
+
+async def _conexao(reader, writer):
+    try:
+        while True:
+            try:
+                bruto = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), TEMPO_OCIOSO)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            linhas = bruto.decode("latin-1").split("\r\n")
+            try:
+                metodo, caminho, versao = linhas[0].split(" ", 2)
+            except ValueError:
+                writer.write(_resposta(400, {"erro": "Requisição inválida."}, False))
+                await writer.drain()
+                return
+            cabecalhos = {}
+            for linha in linhas[1:]:
+                if ":" in linha:
+                    nome, valor = linha.split(":", 1)
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+            conexao = cabecalhos.get("connection", "").lower()
+            # HTTP/1.1 mantém a conexão por padrão; HTTP/1.0 só se pedido
+            manter = conexao != "close" if versao == "HTTP/1.1" else conexao == "keep-alive"
+
+            try:
+                tamanho = int(cabecalhos.get("content-length", 0))
+            except ValueError:
+                tamanho = -1
+            if tamanho < 0 or tamanho > MAX_CORPO:
+                # O corpo não é lido, então a conexão não pode ser reaproveitada
+                status = 400 if tamanho < 0 else 413
+                writer.write(_resposta(status, {"erro": "Tamanho do corpo inválido."}, False))
+                await writer.drain()
+                return
+            try:
+                corpo = await reader.readexactly(tamanho) if tamanho else b""
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+
+            try:
+                if len(corpo) > CORPO_NO_LOOP:
+                    pool = _get_pool()
+                    try:
+                        status, dados = await asyncio.get_running_loop().run_in_executor(
+                            pool, _processar, metodo, caminho, corpo)
+                    except BrokenProcessPool:
+                        _descartar_pool(pool)
+                        raise
+                else:
+                    status, dados = _processar(metodo, caminho, corpo)
+            except Exception:
+                # Nunca deixa o cliente sem resposta; a conexão é encerrada
+                manter = False
+                status, dados = 500, {"erro": "Erro interno."}
+            writer.write(_resposta(status, dados, manter))
+            await writer.drain()
+            if not manter:
+                return
+    finally:
+        writer.close()
+
+
+async def servir(host="127.0.0.1", porta=8000, reuse_port=False):
+    servidor = await asyncio.start_server(_conexao, host, porta, reuse_port=reuse_port, backlog=1024)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        if _pool is not None:
+            _descartar_pool(_pool)
+
+
+def _processo(host, porta, reuse_port):
+    try:
+        asyncio.run(servir(host, porta, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP/JSON das fórmulas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--processos", type=int, default=1,
+                        help="processos servindo a mesma porta (SO_REUSEPORT, só Linux/BSD)")
+    args = parser.parse_args()
+
+    print(f"Servindo em http://{args.host}:{args.porta} ({args.processos} processo(s))")
+    if args.processos <= 1:
+        _processo(args.host, args.porta, False)
+        return
+    # Cada processo tem seu próprio loop; o kernel distribui as conexões
+    processos = [
+        multiprocessing.Process(target=_processo, args=(args.host, args.porta, True))
+        for _ in range(args.processos)
+    ]
+    for p in processos:
+        p.start()
+    # Um SIGTERM no processo principal também encerra os filhos
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for p in processos:
+            p.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in processos:
+            p.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Hash e verificação de senhas fora da thread do Streamlit.
+
+O bcrypt roda num pool de processos limitado, para que uma rajada de
+logins não prenda as threads que executam o script. Configuração por
+variáveis de ambiente:
+
+- CALC_BCRYPT_ROUNDS: custo do bcrypt (padrão 12). Hashes com outro custo
+  são refeitos no próximo login (ver needs_rehash).
+- CALC_BCRYPT_WORKERS: processos no pool (padrão: número de CPUs).
+- CALC_BCRYPT_MAX_QUEUE: operações simultâneas aceitas antes de recusar.
+- CALC_LOGIN_ATTEMPTS / CALC_LOGIN_WINDOW: tentativas de login por usuário
+  dentro da janela em segundos.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import metricas
+
+BCRYPT_ROUNDS = int(os.environ.get("CALC_BCRYPT_ROUNDS", 12))
+POOL_WORKERS = int(os.environ.get("CALC_BCRYPT_WORKERS", os.cpu_count() or 2))
+MAX_QUEUE = int(os.environ.get("CALC_BCRYPT_MAX_QUEUE", POOL_WORKERS * 4))
+LOGIN_ATTEMPTS = int(os.environ.get("CALC_LOGIN_ATTEMPTS", 5))
+LOGIN_WINDOW = float(os.environ.get("CALC_LOGIN_WINDOW", 60))
+TIMEOUT = 30
+
+
+class AuthBusyError(Exception):
+    pass
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def _hash(password, rounds):
+    import bcrypt
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _check(password, hashed):
+    import bcrypt
+    try:
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    except ValueError:
+        # Hash vazio ou corrompido no registro: trata como senha errada
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_QUEUE)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn evita herdar as threads do Streamlit num fork
+                _pool = ProcessPoolExecutor(
+                    max_workers=POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def _descartar_pool(pool):
+    # Um pool quebrado (processo morto) recusa tudo; o próximo uso cria outro
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    vagas = _slots
+    if not vagas.acquire(blocking=False):
+        raise AuthBusyError("fila de autenticação cheia")
+    pool = _get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except (BrokenProcessPool, RuntimeError) as e:
+        vagas.release()
+        _descartar_pool(pool)
+        raise AuthBusyError("pool de autenticação indisponível") from e
+    # A vaga só volta quando o trabalho termina, mesmo que a espera estoure
+    future.add_done_callback(lambda _: vagas.release())
+    try:
+        return future.result(timeout=TIMEOUT)
+    except FuturesTimeoutError as e:
+        raise AuthBusyError("autenticação demorou demais") from e
+    except BrokenProcessPool as e:
+        _descartar_pool(pool)
+        raise AuthBusyError("pool de autenticação indisponível") from e
+
+
+@metricas.cronometrado("hash_password")
+def hash_password(password, rounds=None):
+    return _run(_hash, password, rounds or BCRYPT_ROUNDS)
+
+
+@metricas.cronometrado("check_password")
+def check_password(password, hashed):
+    return _run(_check, password, hashed)
+
+
+def needs_rehash(hashed):
+    # Formato: $2b$<custo>$<salt+hash>
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+_attempts = {}
+_attempts_lock = threading.Lock()
+
+
+def check_rate_limit(username):
+    now = time.monotonic()
+    with _attempts_lock:
+        if len(_attempts) > 10000:
+            # Descarta usuários sem tentativas dentro da janela
+            for name in [n for n, d in _attempts.items() if not d or now - d[-1] > LOGIN_WINDOW]:
+                del _attempts[name]
+        recent = _attempts.setdefault(username, deque())
+        while recent and now - recent[0] > LOGIN_WINDOW:
+            recent.popleft()
+        if len(recent) >= LOGIN_ATTEMPTS:
+            raise RateLimitError(username)
+        recent.append(now)
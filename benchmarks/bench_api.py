@@ -0,0 +1,113 @@
+"""Mede requisições por segundo da API HTTP (api.py).
+
+Sobe o servidor num processo separado e abre várias conexões keep-alive
+simultâneas, cada uma enviando pedidos em sequência durante o tempo
+pedido. Mede pedidos de um item e, com --lote, pedidos em lote.
+
+Uso:
+    python benchmarks/bench_api.py [--conexoes 50] [--duracao 5] [--lote 100] [--processos 1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PEDIDO = {"formula": "Fórmula de Bhaskara", "valores": {"a": 1, "b": -3, "c": 2}}
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _http(corpo):
+    corpo = json.dumps(corpo).encode()
+    return (
+        b"POST /calcular HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+        b"Content-Length: " + str(len(corpo)).encode() + b"\r\n\r\n" + corpo
+    )
+
+
+async def _cliente(porta, mensagem, fim, latencias):
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    try:
+        while time.perf_counter() < fim:
+            t = time.perf_counter()
+            writer.write(mensagem)
+            cabecalho = await reader.readuntil(b"\r\n\r\n")
+            if not cabecalho.startswith(b"HTTP/1.1 200"):
+                raise RuntimeError(cabecalho.decode("latin-1").splitlines()[0])
+            tamanho = int(cabecalho.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            await reader.readexactly(tamanho)
+            latencias.append(time.perf_counter() - t)
+    finally:
+        writer.close()
+
+
+async def _rodada(porta, corpo, conexoes, duracao):
+    mensagem = _http(corpo)
+    latencias = []
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*(_cliente(porta, mensagem, fim, latencias) for _ in range(conexoes)))
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "pedidos": len(latencias),
+        "pedidos_por_s": round(len(latencias) / total, 1),
+        "latencia_p50_ms": round(latencias[len(latencias) // 2] * 1000, 3),
+        "latencia_p99_ms": round(latencias[int(len(latencias) * 0.99)] * 1000, 3),
+    }
+
+
+def _esperar_servidor(porta, servidor, limite=10.0):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if servidor.poll() is not None:
+            raise RuntimeError("o servidor terminou antes de aceitar conexões")
+        try:
+            socket.create_connection(("127.0.0.1", porta), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("o servidor não respondeu a tempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da API HTTP")
+    parser.add_argument("--conexoes", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=5.0, help="segundos por rodada")
+    parser.add_argument("--lote", type=int, default=100, help="itens por pedido na rodada em lote (0 desliga)")
+    parser.add_argument("--processos", type=int, default=1, help="processos do servidor")
+    args = parser.parse_args()
+
+    porta = _porta_livre()
+    servidor = subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, "api.py"), "--porta", str(porta), "--processos", str(args.processos)],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        _esperar_servidor(porta, servidor)
+        resultados = {"conexoes": args.conexoes, "processos": args.processos}
+        resultados["individual"] = asyncio.run(_rodada(porta, PEDIDO, args.conexoes, args.duracao))
+        if args.lote:
+            corpo = {"formula": PEDIDO["formula"], "lote": [PEDIDO["valores"]] * args.lote}
+            lote = asyncio.run(_rodada(porta, corpo, args.conexoes, args.duracao))
+            lote["itens_por_s"] = round(lote["pedidos_por_s"] * args.lote, 1)
+            resultados[f"lote_{args.lote}"] = lote
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Compara a memória dos usuários como dicts (backend.load_all) e em colunas (registros.py).
+
+Gera uma base sintética, grava no backend escolhido e, num processo
+novo para cada modo, carrega todos os usuários e mede:
+
+- memória residente (VmRSS) e memória alocada pelo Python (tracemalloc)
+  depois da carga, já descontado o processo vazio;
+- o pico de alocação durante a carga;
+- o tempo de carga e de leitura de username/amigos de todos os usuários.
+
+A memória residente pode incluir blocos já liberados que o alocador do
+Python ainda não devolveu ao sistema; o tracemalloc mostra só o que
+continua alocado.
+
+Uso:
+    python benchmarks/bench_memoria.py [--usuarios 100000] [--amigos 10] [--storage json,sqlite]
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench_suite import gerar_usuarios  # noqa: E402
+
+
+def rss():
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    import resource
+    # Sem /proc (macOS): o máximo já usado, em bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def medir(modo):
+    """Carrega os usuários no modo pedido (processo filho) e devolve as medidas."""
+    import registros
+    import storage
+
+    backend = storage.get_backend()
+    backend.find_id("")  # abre o arquivo/conexão antes de medir
+
+    def carregar():
+        return backend.load_all() if modo == "dicts" else registros.TabelaUsuarios(backend)
+
+    # Primeira carga: tempo e memória residente
+    gc.collect()
+    rss_antes = rss()
+    t = time.perf_counter()
+    usuarios = carregar()
+    carga = time.perf_counter() - t
+    gc.collect()
+    rss_depois = rss()
+
+    # Segunda carga com o tracemalloc, que deixa tudo bem mais lento
+    del usuarios
+    gc.collect()
+    tracemalloc.start()
+    usuarios = carregar()
+    gc.collect()
+    atual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Leitura dos campos pequenos de todos e da lista de amigos
+    t = time.perf_counter()
+    if modo == "dicts":
+        for user in usuarios.values():
+            user["username"], user["amigos"]
+    else:
+        for user in usuarios:
+            user.username, user.amigos
+    leitura = time.perf_counter() - t
+
+    n = len(usuarios)
+    return {
+        "usuarios": n,
+        "carga_s": carga,
+        "leitura_todos_s": leitura,
+        "rss_bytes": rss_depois - rss_antes,
+        "alocado_bytes": atual,
+        "pico_alocado_bytes": pico,
+        "bytes_por_usuario": atual / n,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória dos registros de usuário")
+    parser.add_argument("--usuarios", type=int, default=100_000)
+    parser.add_argument("--amigos", type=int, default=10, help="amigos por usuário, em média")
+    parser.add_argument("--storage", default="json,sqlite", help="backends, separados por vírgula")
+    parser.add_argument("--_modo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._modo:
+        print(json.dumps(medir(args._modo)))
+        return
+
+    import storage
+
+    # Hash bcrypt de custo 4 com o tamanho real (60 caracteres)
+    senha = "$2b$04$" + "x" * 53
+    users = gerar_usuarios(args.usuarios, args.amigos, senha)
+    for user in users.values():
+        user["anotacao"] = f"Anotação do usuário {user['username']}."
+
+    resultados = {"usuarios": args.usuarios, "amigos_por_usuario": args.amigos}
+    for nome in args.storage.split(","):
+        with tempfile.TemporaryDirectory() as diretorio:
+            env = dict(os.environ, CALC_STORAGE=nome, CALC_CACHE="0", PYTHONPATH=RAIZ)
+            if nome == "sqlite":
+                backend = storage.SqliteBackend(os.path.join(diretorio, storage.SQLITE_FILE))
+            else:
+                backend = storage.JsonBackend(
+                    os.path.join(diretorio, storage.USERS_FILE),
+                    os.path.join(diretorio, storage.USERNAME_INDEX_FILE),
+                )
+            backend.save_all(users)
+
+            resultados[nome] = {}
+            for modo in ("dicts", "colunas"):
+                saida = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--_modo", modo],
+                    cwd=diretorio, env=env, capture_output=True, text=True, check=True,
+                )
+                resultados[nome][modo] = json.loads(saida.stdout.strip().splitlines()[-1])
+            antes = resultados[nome]["dicts"]["alocado_bytes"]
+            depois = resultados[nome]["colunas"]["alocado_bytes"]
+            resultados[nome]["reducao"] = round(1 - depois / antes, 3)
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compara velocidade e precisão das raízes de Bhaskara em float e em Decimal.
+
+Gera equações mal condicionadas (b = 10^k, a e c perto de 1, b² ≫ 4ac),
+onde a fórmula de livro perde a raiz pequena por cancelamento, e mede:
+
+- float, fórmula de livro (-b ± √Δ)/2a, uma equação por vez;
+- float estável (formulas.avaliar), uma por vez;
+- float estável vetorizado (calculos_lote), todas de uma vez;
+- Decimal (formulas.avaliar_preciso) com --digitos algarismos.
+
+O erro é o relativo da raiz de menor módulo, comparada com o cálculo em
+Decimal de 100 algarismos.
+
+Uso:
+    python benchmarks/bench_precisao.py [--equacoes 20000] [--expoentes 2,4,6,8] [--digitos 50]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import calculos_lote  # noqa: E402
+import formulas  # noqa: E402
+
+BHASKARA = "Fórmula de Bhaskara"
+DIGITOS_REFERENCIA = 100
+
+
+def gerar(n, expoente, semente=0):
+    aleatorio = random.Random(semente)
+    return [
+        (aleatorio.uniform(0.5, 2), 10.0 ** expoente * aleatorio.choice((1, -1)), aleatorio.uniform(0.5, 2))
+        for _ in range(n)
+    ]
+
+
+def _livro(a, b, c):
+    raiz = math.sqrt(b**2 - 4*a*c)
+    return (-b + raiz) / (2*a), (-b - raiz) / (2*a)
+
+
+def _menor(x1, x2):
+    return x1 if abs(x1) < abs(x2) else x2
+
+
+def _erro(valor, referencia):
+    if referencia == 0:
+        return abs(float(valor))
+    return float(abs((Decimal(valor) - referencia) / referencia))
+
+
+def _cronometrar(funcao):
+    inicio = time.perf_counter()
+    saida = funcao()
+    return saida, time.perf_counter() - inicio
+
+
+def medir(equacoes, digitos):
+    referencias = []
+    for a, b, c in equacoes:
+        r = formulas.avaliar_preciso(BHASKARA, DIGITOS_REFERENCIA, a=a, b=b, c=c)
+        referencias.append(_menor(r["x1"], r["x2"]))
+
+    def livro():
+        return [_menor(*_livro(a, b, c)) for a, b, c in equacoes]
+
+    def estavel():
+        saida = []
+        for a, b, c in equacoes:
+            r = formulas.avaliar(BHASKARA, a=a, b=b, c=c)
+            saida.append(_menor(r["x1"], r["x2"]))
+        return saida
+
+    def vetorizado():
+        a, b, c = (np.array(coluna) for coluna in zip(*equacoes))
+        r, _ = calculos_lote.FORMULAS_LOTE[BHASKARA]({"a": a, "b": b, "c": c})
+        return np.where(np.abs(r["x1"]) < np.abs(r["x2"]), r["x1"], r["x2"]).tolist()
+
+    def preciso():
+        saida = []
+        for a, b, c in equacoes:
+            r = formulas.avaliar_preciso(BHASKARA, digitos, a=a, b=b, c=c)
+            saida.append(_menor(r["x1"], r["x2"]))
+        return saida
+
+    resultados = {}
+    for nome, funcao in (("float_livro", livro), ("float_estavel", estavel),
+                         ("float_estavel_vetorizado", vetorizado), (f"decimal_{digitos}", preciso)):
+        raizes, duracao = _cronometrar(funcao)
+        erros = sorted(_erro(x, ref) for x, ref in zip(raizes, referencias))
+        resultados[nome] = {
+            "equacoes_por_s": round(len(equacoes) / duracao, 1),
+            "erro_relativo_mediano": erros[len(erros) // 2],
+            "erro_relativo_max": erros[-1],
+        }
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de precisão da fórmula de Bhaskara")
+    parser.add_argument("--equacoes", type=int, default=20_000)
+    parser.add_argument("--expoentes", default="2,4,6,8", help="valores de k em b = 10^k, separados por vírgula")
+    parser.add_argument("--digitos", type=int, default=formulas.PRECISAO_DIGITOS)
+    args = parser.parse_args()
+
+    resultados = {"equacoes": args.equacoes, "digitos": args.digitos}
+    for expoente in map(int, args.expoentes.split(",")):
+        resultados[f"b=1e{expoente}"] = medir(gerar(args.equacoes, expoente), args.digitos)
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
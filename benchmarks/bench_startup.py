@@ -0,0 +1,98 @@
+"""Mede o tempo de importação do app e o tempo até a primeira renderização.
+
+Cada medição roda num processo Python novo (partida a frio), dentro de
+um diretório temporário com um users.json vazio. Sai com código 1 se
+algum tempo ultrapassar o limite, para uso em CI.
+
+Uso:
+    python benchmarks/bench_startup.py [--repeticoes 3] [--limite-import 0.1] [--limite-render 3.0]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importa o streamlit antes para separar o custo do app do custo do framework
+IMPORTACAO = """
+import sys, time
+sys.path.insert(0, {raiz!r})
+import streamlit
+t = time.perf_counter()
+import main
+print(time.perf_counter() - t)
+"""
+
+RENDERIZACAO = """
+import sys, time
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({script!r})
+{sessao}
+at.run(timeout=60)
+assert not at.exception, at.exception
+print(time.perf_counter() - t)
+"""
+
+USUARIO = {"id": "bench", "username": "bench", "password": "", "amigos": [], "notificacoes": [], "anotacao": ""}
+
+PAGINAS = ["Login", "Perfil", "Notificações", "Cálculos"]
+
+
+def medir(codigo, diretorio):
+    # O `streamlit run` põe a pasta do script no sys.path; o AppTest não
+    env = dict(os.environ, PYTHONPATH=RAIZ)
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=diretorio, env=env, capture_output=True, text=True, check=True,
+    )
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de partida a frio")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--limite-import", type=float, default=0.1, help="segundos")
+    parser.add_argument("--limite-render", type=float, default=3.0, help="segundos")
+    args = parser.parse_args()
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as diretorio:
+        with open(os.path.join(diretorio, "users.json"), "w") as f:
+            json.dump({"bench": USUARIO}, f)
+
+        tempos = [medir(IMPORTACAO.format(raiz=RAIZ), diretorio) for _ in range(args.repeticoes)]
+        resultados["import_main_s"] = statistics.median(tempos)
+
+        script = os.path.join(RAIZ, "main.py")
+        resultados["primeira_renderizacao_s"] = {}
+        for pagina in PAGINAS:
+            sessao = ""
+            if pagina != "Login":
+                sessao = f"at.session_state['logged_user'] = {USUARIO!r}\n"
+                if pagina != "Perfil":
+                    # Roda uma vez para criar o seletor e então troca de página
+                    sessao += f"at.run(timeout=60)\nat.sidebar.selectbox[0].select({pagina!r})\n"
+            codigo = RENDERIZACAO.format(script=script, sessao=sessao)
+            tempos = [medir(codigo, diretorio) for _ in range(args.repeticoes)]
+            resultados["primeira_renderizacao_s"][pagina] = statistics.median(tempos)
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+    falhas = []
+    if resultados["import_main_s"] > args.limite_import:
+        falhas.append(f"import main: {resultados['import_main_s']:.3f}s > {args.limite_import}s")
+    for pagina, tempo in resultados["primeira_renderizacao_s"].items():
+        if tempo > args.limite_render:
+            falhas.append(f"{pagina}: {tempo:.3f}s > {args.limite_render}s")
+    if falhas:
+        print("Regressão de desempenho:\n" + "\n".join(falhas), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
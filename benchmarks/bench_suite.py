@@ -0,0 +1,366 @@
+"""Suíte de benchmarks: storage, login, registro, notificações, fórmulas e sessões.
+
+Para cada tamanho de base (ex.: 1k, 100k e 1M usuários) gera usuários,
+amizades e pedidos de amizade sintéticos num diretório temporário e mede,
+num processo novo (para não herdar caches nem singletons):
+
+- load_users / save_users e a escrita de um único registro;
+- a busca do login (find_user_id + load_user) e a checagem de usuário
+  duplicado do registro;
+- a montagem do grafo de amigos e o processamento da caixa de
+  notificações (pedidos pendentes + solicitantes da primeira página);
+- várias sessões simultâneas do app com o AppTest do Streamlit.
+
+As fórmulas da aba de cálculos são medidas uma vez, fora das bases.
+O resultado sai em JSON (--saida); com --comparar, os tempos são
+comparados com um resultado anterior e o script sai com código 1 se
+algum piorar mais que a tolerância.
+
+Uso:
+    python benchmarks/bench_suite.py [--tamanhos 1000,100000] [--storage json,sqlite]
+        [--sessoes 20] [--saida resultado.json] [--comparar anterior.json] [--tolerancia 0.25]
+
+O tamanho 1000000 funciona, mas com o backend JSON cada gravação
+reescreve centenas de MB e a rodada leva minutos.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Entradas de exemplo de cada fórmula; as demais entradas valem 2.0
+AMOSTRAS = {
+    "Fórmula de Bhaskara": {"a": 1.0, "b": -3.0, "c": 2.0},
+    "Torricelli": {"v0": 3.0, "a": 2.0, "s": 4.0},
+}
+
+
+def cronometrar(funcao, repeticoes):
+    """Mediana, em segundos, de `repeticoes` chamadas de funcao()."""
+    tempos = []
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - t)
+    return statistics.median(tempos)
+
+
+def percentis(tempos):
+    tempos = sorted(tempos)
+    return {
+        "p50_s": tempos[len(tempos) // 2],
+        "p95_s": tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))],
+        "max_s": tempos[-1],
+    }
+
+
+# ---------------- Base sintética ---------------- #
+
+def gerar_usuarios(n, amigos_por_usuario, senha_hash, semente=42):
+    aleatorio = random.Random(semente)
+    users = {
+        f"u{i}": {
+            "id": f"u{i}", "username": f"user{i}", "password": senha_hash,
+            "amigos": [], "notificacoes": [], "anotacao": "",
+        }
+        for i in range(n)
+    }
+    ids = list(users)
+    # Arestas simétricas, como as criadas ao aceitar um pedido
+    for _ in range(n * amigos_por_usuario // 2):
+        a, b = aleatorio.sample(ids, 2)
+        if b not in users[a]["amigos"]:
+            users[a]["amigos"].append(b)
+            users[b]["amigos"].append(a)
+    return users
+
+
+# ---------------- Medições de uma base (processo filho) ---------------- #
+
+def medir_base(n, amigos_por_usuario, repeticoes, sessoes):
+    import auth
+    import storage
+
+    aleatorio = random.Random(7)
+    resultado = {"usuarios": n}
+
+    senha_hash = auth._hash("senha", 4)
+    t = time.perf_counter()
+    users = gerar_usuarios(n, amigos_por_usuario, senha_hash)
+    resultado["geracao_s"] = time.perf_counter() - t
+    resultado["arestas"] = sum(len(u["amigos"]) for u in users.values()) // 2
+
+    backend = storage.get_backend()
+    resultado["save_users_s"] = cronometrar(lambda: backend.save_all(users), repeticoes)
+    resultado["load_users_s"] = cronometrar(backend.load_all, repeticoes)
+
+    amostra = aleatorio.sample(list(users), min(200, n))
+
+    # Login: busca pelo username e leitura do registro (sem o bcrypt)
+    def login(user_id):
+        encontrado = backend.find_id(users[user_id]["username"])
+        return backend.get(encontrado)
+
+    resultado["login_busca_frio_s"] = cronometrar(lambda: login(amostra[0]), 1)
+    resultado["login_busca_s"] = cronometrar(lambda: [login(u) for u in amostra], repeticoes) / len(amostra)
+
+    # Registro: checagem de nome existente e de nome livre, e a gravação do novo usuário
+    resultado["registro_duplicado_s"] = cronometrar(
+        lambda: [backend.find_id(users[u]["username"]) for u in amostra], repeticoes) / len(amostra)
+    resultado["registro_livre_s"] = cronometrar(
+        lambda: [backend.find_id(f"novo{i}") for i in range(len(amostra))], repeticoes) / len(amostra)
+    novos = iter(range(repeticoes))
+
+    def registrar():
+        user_id = f"novo{next(novos)}"
+        with backend.transaction([user_id]) as records:
+            records[user_id] = {"id": user_id, "username": user_id, "password": senha_hash,
+                                "amigos": [], "notificacoes": [], "anotacao": ""}
+
+    resultado["registro_escrita_s"] = cronometrar(registrar, repeticoes)
+
+    def anotar():
+        with backend.transaction([amostra[0]]) as records:
+            records[amostra[0]]["anotacao"] = str(time.time())
+
+    resultado["escrita_um_registro_s"] = cronometrar(anotar, repeticoes)
+
+    # Grafo de amigos: construção a partir dos registros e consultas
+    import amigos
+
+    grafo = amigos.grafo()
+    resultado["grafo_construcao_s"] = cronometrar(lambda: grafo.total(amostra[0]), 1)
+    resultado["grafo_pagina_amigos_s"] = cronometrar(
+        lambda: [grafo.nomes(grafo.pagina(u)) for u in amostra], repeticoes) / len(amostra)
+
+    # Notificações: um pedido pendente a cada 10 usuários, mais uma caixa cheia
+    import notificacoes
+
+    fila = notificacoes.fila()
+    destinatario = amostra[0]
+    remetentes = aleatorio.sample(list(users), min(500, n - 1))
+    pedidos = [(aleatorio.choice(amostra), f"u{i}") for i in range(0, n, 10)]
+    pedidos += [(r, destinatario) for r in remetentes if r != destinatario]
+    t = time.perf_counter()
+    for remetente, para in pedidos:
+        fila.enviar(notificacoes.PEDIDO_AMIZADE, remetente, para)
+    fila.esperar()
+    resultado["notificacoes_pendentes"] = len(pedidos)
+    resultado["notificacoes_envio_s"] = (time.perf_counter() - t) / len(pedidos)
+    resultado["notificacoes_carga_fila_s"] = cronometrar(notificacoes.FilaNotificacoes, repeticoes)
+
+    def caixa():
+        # O que show_notificacoes faz antes de desenhar a primeira página
+        pendentes = notificacoes.pedidos_pendentes(destinatario)
+        return backend.get_many(pendentes[:amigos.PEDIDOS_POR_PAGINA])
+
+    resultado["notificacoes_caixa_s"] = cronometrar(caixa, repeticoes)
+
+    if sessoes:
+        # Metade das sessões abre a caixa cheia de pedidos
+        usuarios = [users[destinatario] if i % 2 else users[aleatorio.choice(amostra)] for i in range(sessoes)]
+        resultado["sessoes"] = medir_sessoes(usuarios)
+    return resultado
+
+
+def sessao(user):
+    """Uma sessão do app (processo filho): Perfil, Notificações, Cálculos e um cálculo."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(RAIZ, "main.py"), default_timeout=120)
+    at.session_state["logged_user"] = user
+    # Avisa que terminou de importar e espera todas as sessões ficarem prontas
+    print("pronto", flush=True)
+    sys.stdin.readline()
+
+    medidas = {}
+    t = time.perf_counter()
+    at.run()
+    medidas["Perfil"] = time.perf_counter() - t
+    for pagina in ("Notificações", "Cálculos"):
+        at.sidebar.selectbox[0].select(pagina)
+        t = time.perf_counter()
+        at.run()
+        medidas[pagina] = time.perf_counter() - t
+    for numero in at.number_input:
+        if numero.label not in ("De:", "Até:", "Pontos:"):
+            numero.set_value(2.0)
+    t = time.perf_counter()
+    at.button[0].click().run()
+    medidas["calcular"] = time.perf_counter() - t
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return medidas
+
+
+def medir_sessoes(usuarios):
+    """Sessões simultâneas do app, cada uma num processo, sobre a mesma base.
+
+    O AppTest não roda várias sessões em threads do mesmo processo, então
+    cada sessão é um processo; todas começam juntas depois de importar o
+    Streamlit.
+    """
+    processos = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--_sessao", json.dumps(user)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        for user in usuarios
+    ]
+    for p in processos:
+        p.stdout.readline()
+    t = time.perf_counter()
+    for p in processos:
+        p.stdin.write("\n")
+        p.stdin.flush()
+
+    tempos = {}
+    erros = []
+    for p in processos:
+        saida, stderr = p.communicate()
+        if p.returncode != 0:
+            erros.append(stderr.strip().splitlines()[-1] if stderr.strip() else f"código {p.returncode}")
+            continue
+        for chave, valor in json.loads(saida.strip().splitlines()[-1]).items():
+            tempos.setdefault(chave, []).append(valor)
+    resultado = {"quantidade": len(usuarios), "total_s": time.perf_counter() - t, "erros": erros}
+    for chave, valores in tempos.items():
+        resultado[chave] = percentis(valores)
+    return resultado
+
+
+# ---------------- Fórmulas ---------------- #
+
+def medir_formulas(repeticoes, linhas=100_000):
+    import numpy as np
+
+    import calculos_lote
+    import formulas
+
+    resultados = {}
+    for nome, formula in formulas.FORMULAS.items():
+        valores = {e.nome: AMOSTRAS.get(nome, {}).get(e.nome, 2.0) for e in formula.entradas}
+        chamadas = 10_000
+        medidas = {
+            "avaliar_s": cronometrar(
+                lambda: [formulas.avaliar(nome, **valores) for _ in range(chamadas)], repeticoes) / chamadas,
+        }
+
+        # Sem cache: cada chamada usa uma entrada diferente
+        deslocamentos = iter(range(10**9))
+
+        def sem_cache():
+            d = next(deslocamentos) * 1e-9
+            formulas.calcular_com_passos(nome, **{k: v + d for k, v in valores.items()})
+
+        medidas["passos_sem_cache_s"] = cronometrar(lambda: [sem_cache() for _ in range(1000)], repeticoes) / 1000
+        medidas["passos_com_cache_s"] = cronometrar(
+            lambda: [formulas.calcular_com_passos(nome, **valores) for _ in range(chamadas)], repeticoes) / chamadas
+
+        tabela = {k: np.full(linhas, v) for k, v in valores.items()}
+        tempo = cronometrar(lambda: calculos_lote.FORMULAS_LOTE[nome](tabela), repeticoes)
+        medidas["lote_linhas_por_s"] = linhas / tempo
+        resultados[nome] = medidas
+    return resultados
+
+
+# ---------------- Execução e comparação ---------------- #
+
+def rodar_base(n, backend, args):
+    """Roda medir_base num processo novo, dentro de um diretório temporário."""
+    with tempfile.TemporaryDirectory() as diretorio:
+        env = dict(os.environ, CALC_STORAGE=backend, PYTHONPATH=RAIZ)
+        saida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--_base", str(n),
+             "--amigos", str(args.amigos), "--repeticoes", str(args.repeticoes),
+             "--sessoes", str(args.sessoes)],
+            cwd=diretorio, env=env, capture_output=True, text=True,
+        )
+    if saida.returncode != 0:
+        raise RuntimeError(f"base {n} ({backend}) falhou:\n{saida.stderr}")
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def tempos(resultado, prefixo=""):
+    """Achata o resultado em {caminho: segundos} para as chaves terminadas em _s."""
+    itens = {}
+    for chave, valor in resultado.items():
+        caminho = f"{prefixo}{chave}"
+        if isinstance(valor, dict):
+            itens.update(tempos(valor, caminho + "."))
+        elif chave.endswith("_s") and isinstance(valor, (int, float)):
+            itens[caminho] = valor
+    return itens
+
+
+def comparar(atual, anterior, tolerancia):
+    novos = tempos(atual)
+    regressoes = []
+    for caminho, antes in tempos(anterior).items():
+        # Tempos muito pequenos oscilam demais para comparar
+        if caminho in novos and antes > 1e-5 and novos[caminho] > antes * (1 + tolerancia):
+            regressoes.append(f"{caminho}: {antes:.6f}s -> {novos[caminho]:.6f}s")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks da calculadora")
+    parser.add_argument("--tamanhos", default="1000,100000", help="quantidades de usuários, separadas por vírgula")
+    parser.add_argument("--storage", default="json,sqlite", help="backends, separados por vírgula")
+    parser.add_argument("--amigos", type=int, default=10, help="amigos por usuário, em média")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--sessoes", type=int, default=20, help="sessões simultâneas do AppTest (0 desliga)")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--comparar", help="resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="piora aceita (0.25 = 25%%)")
+    parser.add_argument("--_base", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--_sessao", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._sessao is not None:
+        print(json.dumps(sessao(json.loads(args._sessao))))
+        return
+
+    if args._base is not None:
+        print(json.dumps(medir_base(args._base, args.amigos, args.repeticoes, args.sessoes)))
+        return
+
+    resultado = {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "formulas": medir_formulas(args.repeticoes),
+        "bases": {},
+    }
+    for backend in args.storage.split(","):
+        for n in (int(t) for t in args.tamanhos.split(",")):
+            print(f"base {n} ({backend})...", file=sys.stderr)
+            resultado["bases"][f"{backend}_{n}"] = rodar_base(n, backend, args)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regressoes = comparar(resultado, json.load(f), args.tolerancia)
+        if regressoes:
+            print("Regressão de desempenho:\n" + "\n".join(regressoes), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
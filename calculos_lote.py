@@ -0,0 +1,168 @@
+"""Cálculos em lote: aplica uma fórmula a todas as linhas de uma tabela.
+
+Cada fórmula recebe as colunas de entrada como arrays NumPy e devolve as
+colunas de resultado mais uma coluna "erro", vazia nas linhas válidas e
+com a mesma mensagem mostrada na calculadora individual nas demais.
+Células vazias ou que não são números dão erro só na própria linha.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from formulas import E, FORMULAS, G
+
+
+def _divisao(numerador, denominador, mensagem):
+    ok = denominador != 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resultado = np.where(ok, numerador / np.where(ok, denominador, 1), np.nan)
+    return resultado, np.where(ok, "", mensagem)
+
+
+def _velocidade_media(c):
+    v, erro = _divisao(c["distancia"], c["tempo"], "O tempo não pode ser zero!")
+    return {"velocidade": v}, erro
+
+
+def _forca_resultante(c):
+    return {"forca": c["massa"] * c["aceleracao"]}, None
+
+
+def _bhaskara(c):
+    # Mesma forma estável de formulas._bhaskara, linha a linha
+    a, b, cc = c["a"], c["b"], c["c"]
+    delta = b**2 - 4*a*cc
+    raiz = np.sqrt(np.where(delta >= 0, delta, 0))
+    a_ok = a != 0
+    a_div = np.where(a_ok, a, 1)
+    ok = (delta >= 0) & a_ok
+    complexa = (delta < 0) & a_ok
+    with np.errstate(divide="ignore", invalid="ignore"):
+        direta = (b == 0) | (cc == 0)
+        q = np.where(b > 0, -(b + raiz) / 2, (raiz - b) / 2)
+        x1 = np.where(direta, (-b + raiz) / (2*a_div), np.where(b > 0, cc / q, q / a_div))
+        x2 = np.where(direta, (-b - raiz) / (2*a_div), np.where(b > 0, q / a_div, cc / q))
+        imaginaria = np.sqrt(np.where(complexa, -delta, 0)) / np.abs(2*a_div)
+    x1 = np.where(ok, x1, np.nan)
+    x2 = np.where(ok, x2, np.nan)
+    # Raízes complexas quando Δ < 0: real ± imaginaria·i
+    real = np.where(complexa, -b / (2*a_div), np.nan)
+    imaginaria = np.where(complexa, imaginaria, np.nan)
+    erro = np.where(a == 0, "O coeficiente a não pode ser zero!",
+                    np.where(delta < 0, "Não existem raízes reais.", ""))
+    return {"delta": delta, "x1": x1, "x2": x2, "real": real, "imaginaria": imaginaria}, erro
+
+
+def _corrente(c):
+    corrente, erro = _divisao(c["carga"], c["tempo"], "O tempo não pode ser zero!")
+    return {"corrente": corrente}, erro
+
+
+def _area_quadrado(c):
+    return {"area": c["lado"] ** 2}, None
+
+
+def _area_retangulo(c):
+    return {"area": c["base"] * c["altura"]}, None
+
+
+def _area_triangulo(c):
+    return {"area": (c["base"] * c["altura"]) / 2}, None
+
+
+def _area_circulo(c):
+    return {"area": np.pi * c["raio"] ** 2}, None
+
+
+def _forca_gravitacional(c):
+    fg, erro = _divisao(G * (c["m1"] * c["m2"]), c["distancia"]**2, "A distância não pode ser zero!")
+    return {"forca": fg}, erro
+
+
+def _torricelli(c):
+    vf2 = c["v0"]**2 + 2*c["a"]*c["s"]
+    ok = vf2 >= 0
+    vf = np.where(ok, np.sqrt(np.where(ok, vf2, 0)), np.nan)
+    erro = np.where(ok, "", "Resultado inválido (velocidade imaginária).")
+    return {"v2": vf2, "velocidade": vf}, erro
+
+
+def _carga(c):
+    return {"carga": c["n"] * E}, None
+
+
+def _tempo(c):
+    t, erro = _divisao(c["d"], c["v"], "A velocidade não pode ser zero!")
+    return {"tempo": t}, erro
+
+
+# Versão vetorizada de cada fórmula do registro; as colunas de entrada
+# têm os mesmos nomes das entradas declaradas em formulas.FORMULAS
+FORMULAS_LOTE = {
+    "Velocidade Média": _velocidade_media,
+    "Força Resultante": _forca_resultante,
+    "Fórmula de Bhaskara": _bhaskara,
+    "Corrente Elétrica": _corrente,
+    "Área do Quadrado": _area_quadrado,
+    "Área do Retângulo": _area_retangulo,
+    "Área do Triângulo": _area_triangulo,
+    "Área do Círculo": _area_circulo,
+    "Força Gravitacional": _forca_gravitacional,
+    "Torricelli": _torricelli,
+    "Carga Elétrica": _carga,
+    "Tempo": _tempo,
+}
+
+
+def ler_tabela(nome_arquivo, conteudo):
+    if nome_arquivo.lower().endswith(".parquet"):
+        return pd.read_parquet(io.BytesIO(conteudo))
+    return pd.read_csv(io.BytesIO(conteudo))
+
+
+def calcular_lote(nome, tabela):
+    colunas = [entrada.nome for entrada in FORMULAS[nome].entradas]
+    funcao = FORMULAS_LOTE[nome]
+    faltando = [col for col in colunas if col not in tabela.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes: {', '.join(faltando)}")
+
+    # Células vazias ou que não são números viram NaN e erro na própria linha
+    entradas = {col: pd.to_numeric(tabela[col], errors="coerce").to_numpy(dtype=float) for col in colunas}
+    resultados, erro = funcao(entradas)
+
+    if erro is None:
+        erro = np.full(len(tabela), "", dtype=object)
+    invalida = np.zeros(len(tabela), dtype=bool)
+    # Em ordem inversa para que a mensagem fique com a primeira coluna inválida
+    for col in reversed(colunas):
+        ruim = ~np.isfinite(entradas[col])
+        erro = np.where(ruim, f"Valor ausente ou inválido: {col}", erro)
+        invalida |= ruim
+
+    saida = tabela[colunas].copy()
+    for col, valores in resultados.items():
+        saida[col] = np.where(invalida, np.nan, valores)
+    saida["erro"] = erro
+    return saida
+
+
+def exportar(saida, formato):
+    """Conteúdo do arquivo de resultado em "csv" ou "parquet"."""
+    # pyarrow já vem com o Streamlit; o to_csv do pandas leva ~15 s por milhão de linhas
+    import pyarrow as pa
+
+    # Colunas de entrada com texto misturado (ex.: "abc" numa coluna numérica)
+    # vão como texto; o tipo string do pandas mantém as células vazias vazias
+    textos = saida.select_dtypes(include="object").columns
+    saida = saida.astype({col: "string" for col in textos})
+    tabela = pa.Table.from_pandas(saida, preserve_index=False)
+    destino = io.BytesIO()
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(tabela, destino)
+    else:
+        import pyarrow.csv as pc
+        pc.write_csv(tabela, destino)
+    return destino.getvalue()
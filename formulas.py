@@ -0,0 +1,654 @@
+"""Registro das fórmulas da calculadora, independente do Streamlit.
+
+Cada Formula declara suas entradas (com unidades), uma função de cálculo
+pura, a mensagem de resultado e o passo a passo em LaTeX. A aba de
+cálculos monta a interface a partir de FORMULAS, e o mesmo registro pode
+ser usado direto pelo Python ou pela linha de comando:
+
+    python formulas.py "Torricelli" v0=3 a=2 s=4 --passos
+    python formulas.py "Fórmula de Bhaskara" a=1 b=1e8 c=1 --digitos 50
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal, localcontext
+from fractions import Fraction
+from typing import Callable, Optional
+
+G = 6.67430e-11
+E = 1.6e-19  # Carga elementar
+
+# Cache de resultados + passo a passo (ver calcular_com_passos)
+CACHE_TAMANHO = int(os.environ.get("CALC_CACHE_FORMULAS", 1024))
+CACHE_TTL = float(os.environ.get("CALC_CACHE_FORMULAS_TTL", 3600))
+
+# Algarismos significativos do modo de alta precisão (ver avaliar_preciso)
+PRECISAO_DIGITOS = int(os.environ.get("CALC_PRECISAO_DIGITOS", 50))
+
+
+class DominioError(ValueError):
+    """Entrada fora do domínio da fórmula (ex.: divisão por zero)."""
+
+
+@dataclass(frozen=True)
+class Entrada:
+    nome: str
+    rotulo: str
+    unidade: str = ""
+    step: Optional[float] = 1.0
+
+
+@dataclass(frozen=True)
+class Formula:
+    nome: str
+    entradas: tuple
+    calcular: Callable[..., dict]
+    mensagem: Callable[[dict, dict], str]
+    passos: Callable[[dict, dict], str]
+    botao: str
+    titulo: Optional[str] = None
+    grupo: Optional[str] = None
+    opcao: Optional[str] = None
+
+
+# ---------------- Aritmética float / Decimal ---------------- #
+#
+# As funções de cálculo recebem float no uso normal e Decimal no modo de
+# alta precisão. Raízes e constantes passam por estes auxiliares para
+# manter o tipo da entrada (e a precisão do contexto decimal atual).
+
+def _raiz(x):
+    return x.sqrt() if isinstance(x, Decimal) else math.sqrt(x)
+
+
+def _constante(x, valor):
+    return Decimal(repr(valor)) if isinstance(x, Decimal) else valor
+
+
+def _pi(x):
+    if not isinstance(x, Decimal):
+        return math.pi
+    # Série de Taylor da documentação do módulo decimal
+    with localcontext() as ctx:
+        ctx.prec += 2
+        three = Decimal(3)
+        lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+    return +s
+
+
+# ---------------- Velocidade Média ---------------- #
+
+def _velocidade_media(distancia, tempo):
+    if tempo == 0:
+        raise DominioError("O tempo não pode ser zero!")
+    return {"velocidade": distancia / tempo}
+
+
+def _passos_velocidade_media(v, r):
+    return f"\n## Cálculo da Velocidade Média (m/s)\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$v = \\frac{{\\Delta s}}{{\\Delta t}}$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$v = \\frac{{{v['distancia']}}}{{{v['tempo']}}}$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$v = {r['velocidade']:.2f} \\text{{ m/s}}$$\n"
+
+
+# ---------------- Força Resultante ---------------- #
+
+def _forca_resultante(massa, aceleracao):
+    return {"forca": massa * aceleracao}
+
+
+def _passos_forca_resultante(v, r):
+    return f"\n## Cálculo da Força Resultante (N)\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$F = m \\times a$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$F = {v['massa']} \\times {v['aceleracao']}$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$F = {r['forca']:.2f} \\text{{ N}}$$\n"
+
+
+# ---------------- Bhaskara ---------------- #
+
+def _bhaskara(a, b, c):
+    if a == 0:
+        raise DominioError("O coeficiente a não pode ser zero!")
+    delta = b**2 - 4*a*c
+    if delta < 0:
+        # Raízes complexas conjugadas: real ± imaginaria·i
+        return {
+            "delta": delta,
+            "aviso": "Não existem raízes reais.",
+            "real": -b / (2*a),
+            "imaginaria": _raiz(-delta) / abs(2*a),
+        }
+    raiz = _raiz(delta)
+    if b == 0 or c == 0:
+        # Sem cancelamento possível; a forma direta também evita 0/0 e -0.0
+        return {"delta": delta, "x1": (-b + raiz) / (2*a), "x2": (-b - raiz) / (2*a)}
+    # Forma estável: -b e ±√Δ nunca se cancelam quando b² ≫ 4ac.
+    # q = -(b + sinal(b)·√Δ)/2 dá uma raiz por q/a e a outra por c/q;
+    # x1 continua sendo a raiz com +√Δ, como no passo a passo.
+    if b > 0:
+        q = -(b + raiz) / 2
+        x1, x2 = c / q, q / a
+    else:
+        q = (raiz - b) / 2
+        x1, x2 = q / a, c / q
+    return {"delta": delta, "x1": x1, "x2": x2}
+
+
+def _passos_bhaskara(v, r):
+    a, b, c, delta = v["a"], v["b"], v["c"], r["delta"]
+    steps = f"\n## Cálculo das Raízes pela Fórmula de Bhaskara\n" \
+            f"\n### Fórmula\n" \
+            f"\n$$x = \\frac{{-b \\pm \\sqrt{{b^2 - 4ac}}}}{{2a}}$$\n" \
+            f"\n### Cálculo do Discriminante (Δ)\n" \
+            f"\n$$\\Delta = b^2 - 4ac$$\n" \
+            f"\n$$\\Delta = {b}^2 - 4 \\times {a} \\times {c}$$\n" \
+            f"\n$$\\Delta = {delta:.2f}$$\n"
+    if "aviso" in r:
+        steps += f"\n### Resultado\n" \
+                 f"\nNão existem raízes reais (Δ < 0)\n" \
+                 f"\n### Raízes complexas\n" \
+                 f"\n$$x = \\frac{{-b}}{{2a}} \\pm \\frac{{\\sqrt{{-\\Delta}}}}{{2|a|}}i = {r['real']:.2f} \\pm {r['imaginaria']:.2f}i$$\n"
+    else:
+        x1, x2 = r["x1"], r["x2"]
+        steps += f"\n### Cálculo das Raízes\n" \
+                 f"\n$$x_1 = \\frac{{-b + \\sqrt{{\\Delta}}}}{{2a}} = \\frac{{-{b} + \\sqrt{{{delta:.2f}}}}}{{2 \\times {a}}} = {x1:.2f}$$\n" \
+                 f"\n$$x_2 = \\frac{{-b - \\sqrt{{\\Delta}}}}{{2a}} = \\frac{{-{b} - \\sqrt{{{delta:.2f}}}}}{{2 \\times {a}}} = {x2:.2f}$$\n" \
+                 f"\n### Resultado\n" \
+                 f"\n$$x_1 = {x1:.2f}$$\n" \
+                 f"\n$$x_2 = {x2:.2f}$$\n"
+    return steps
+
+
+# ---------------- Corrente Elétrica ---------------- #
+
+def _corrente(carga, tempo):
+    if tempo == 0:
+        raise DominioError("O tempo não pode ser zero!")
+    return {"corrente": carga / tempo}
+
+
+def _passos_corrente(v, r):
+    return f"\n## Cálculo da Corrente Elétrica (A)\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$I = \\frac{{Q}}{{\\Delta t}}$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$I = \\frac{{{v['carga']}}}{{{v['tempo']}}}$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$I = {r['corrente']:.2f} \\text{{ A}}$$\n"
+
+
+# ---------------- Áreas ---------------- #
+
+def _area_quadrado(lado):
+    return {"area": lado ** 2}
+
+
+def _passos_area_quadrado(v, r):
+    return f"\n## Cálculo da Área do Quadrado\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$A = lado^2$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$A = {v['lado']}^2$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$A = {r['area']:.2f}$$\n"
+
+
+def _area_retangulo(base, altura):
+    return {"area": base * altura}
+
+
+def _passos_area_retangulo(v, r):
+    return f"\n## Cálculo da Área do Retângulo\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$A = base \\times altura$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$A = {v['base']} \\times {v['altura']}$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$A = {r['area']:.2f}$$\n"
+
+
+def _area_triangulo(base, altura):
+    return {"area": (base * altura) / 2}
+
+
+def _passos_area_triangulo(v, r):
+    return f"\n## Cálculo da Área do Triângulo\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$A = \\frac{{base \\times altura}}{{2}}$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$A = \\frac{{{v['base']} \\times {v['altura']}}}{{2}}$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$A = {r['area']:.2f}$$\n"
+
+
+def _area_circulo(raio):
+    return {"area": _pi(raio) * raio ** 2}
+
+
+def _passos_area_circulo(v, r):
+    return f"\n## Cálculo da Área do Círculo\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$A = \\pi \\times raio^2$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$A = \\pi \\times {v['raio']}^2$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$A = {r['area']:.2f}$$\n"
+
+
+def _mensagem_area(v, r):
+    return f"A área é {r['area']:.2f}"
+
+
+# ---------------- Força Gravitacional ---------------- #
+
+def _forca_gravitacional(m1, m2, distancia):
+    if distancia == 0:
+        raise DominioError("A distância não pode ser zero!")
+    return {"forca": _constante(m1, G) * (m1 * m2) / distancia**2}
+
+
+def _passos_forca_gravitacional(v, r):
+    return f"\n## Cálculo da Força Gravitacional (N)\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$F = G \\times \\frac{{m_1 \\times m_2}}{{d^2}}$$\n" \
+           f"\n### Constante Gravitacional\n" \
+           f"\n$$G = 6.67430 \\times 10^{{-11}} \\text{{ Nm}}^2/\\text{{kg}}^2$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$F = 6.67430 \\times 10^{{-11}} \\times \\frac{{{v['m1']} \\times {v['m2']}}}{{{v['distancia']}^2}}$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$F = {r['forca']:.4e} \\text{{ N}}$$\n"
+
+
+# ---------------- Torricelli ---------------- #
+
+def _torricelli(v0, a, s):
+    vf2 = v0**2 + 2*a*s
+    if vf2 < 0:
+        return {"v2": vf2, "aviso": "Resultado inválido (velocidade imaginária)."}
+    return {"v2": vf2, "velocidade": _raiz(vf2)}
+
+
+def _passos_torricelli(v, r):
+    v0, a, s, vf2 = v["v0"], v["a"], v["s"], r["v2"]
+    steps = f"\n## Cálculo da Velocidade Final (Torricelli)\n" \
+            f"\n### Fórmula\n" \
+            f"\n$$v^2 = v_0^2 + 2 \\times a \\times \\Delta s$$\n" \
+            f"\n### Substituindo os valores\n" \
+            f"\n$$v^2 = {v0}^2 + 2 \\times {a} \\times {s}$$\n" \
+            f"\n$$v^2 = {v0**2:.2f} + {2*a*s:.2f}$$\n" \
+            f"\n$$v^2 = {vf2:.2f}$$\n"
+    if "aviso" in r:
+        steps += f"\n### Resultado\n" \
+                 f"\nNão existe solução real (raiz quadrada de número negativo)\n"
+    else:
+        steps += f"\n$$v = \\sqrt{{{vf2:.2f}}}$$\n" \
+                 f"\n### Resultado\n" \
+                 f"\n$$v = {r['velocidade']:.2f} \\text{{ m/s}}$$\n"
+    return steps
+
+
+# ---------------- Carga Elétrica ---------------- #
+
+def _carga(n):
+    return {"carga": n * _constante(n, E)}
+
+
+def _passos_carga(v, r):
+    return f"\n## Cálculo da Carga Elétrica (C)\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$Q = n \\times e$$\n" \
+           f"\n### Carga Elementar\n" \
+           f"\n$$e = 1.6 \\times 10^{{-19}} \\text{{ C}}$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$Q = {v['n']} \\times 1.6 \\times 10^{{-19}}$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$Q = {r['carga']:.4e} \\text{{ C}}$$\n"
+
+
+# ---------------- Tempo ---------------- #
+
+def _tempo(d, v):
+    if v == 0:
+        raise DominioError("A velocidade não pode ser zero!")
+    return {"tempo": d / v}
+
+
+def _passos_tempo(v, r):
+    return f"\n## Cálculo do Tempo (s)\n" \
+           f"\n### Fórmula\n" \
+           f"\n$$t = \\frac{{d}}{{v}}$$\n" \
+           f"\n### Substituindo os valores\n" \
+           f"\n$$t = \\frac{{{v['d']}}}{{{v['v']}}}$$\n" \
+           f"\n### Resultado\n" \
+           f"\n$$t = {r['tempo']:.2f} \\text{{ s}}$$\n"
+
+
+# ---------------- Registro ---------------- #
+
+AREAS = "Área de Figuras Geométricas"
+
+# Rótulo do seletor secundário de cada grupo
+GRUPOS = {AREAS: "Escolha a figura:"}
+
+_LISTA = [
+    Formula(
+        nome="Velocidade Média",
+        titulo="Velocidade Média: v = Δs / Δt",
+        entradas=(
+            Entrada("distancia", "Digite a distância (Δs) em metros:", "m"),
+            Entrada("tempo", "Digite o tempo (Δt) em segundos:", "s"),
+        ),
+        calcular=_velocidade_media,
+        mensagem=lambda v, r: f"A velocidade média é {r['velocidade']:.2f} m/s",
+        passos=_passos_velocidade_media,
+        botao="Calcular Velocidade",
+    ),
+    Formula(
+        nome="Força Resultante",
+        titulo="Força Resultante: F = m * a",
+        entradas=(
+            Entrada("massa", "Digite a massa (m) em kg:", "kg"),
+            Entrada("aceleracao", "Digite a aceleração (a) em m/s²:", "m/s²"),
+        ),
+        calcular=_forca_resultante,
+        mensagem=lambda v, r: f"A força resultante é {r['forca']:.2f} N",
+        passos=_passos_forca_resultante,
+        botao="Calcular Força",
+    ),
+    Formula(
+        nome="Fórmula de Bhaskara",
+        titulo="Bhaskara: ax² + bx + c = 0",
+        entradas=(
+            Entrada("a", "Digite o valor de a:", step=None),
+            Entrada("b", "Digite o valor de b:", step=None),
+            Entrada("c", "Digite o valor de c:", step=None),
+        ),
+        calcular=_bhaskara,
+        mensagem=lambda v, r: f"x₁ = {r['x1']:.2f}, x₂ = {r['x2']:.2f}",
+        passos=_passos_bhaskara,
+        botao="Calcular Bhaskara",
+    ),
+    Formula(
+        nome="Corrente Elétrica",
+        titulo="Corrente Elétrica: I = Q / Δt",
+        entradas=(
+            Entrada("carga", "Digite a carga elétrica (Q) em Coulombs:", "C"),
+            Entrada("tempo", "Digite o tempo (Δt) em segundos:", "s"),
+        ),
+        calcular=_corrente,
+        mensagem=lambda v, r: f"A corrente elétrica é {r['corrente']:.2f} A",
+        passos=_passos_corrente,
+        botao="Calcular Corrente",
+    ),
+    Formula(
+        nome="Área do Quadrado",
+        grupo=AREAS,
+        opcao="Quadrado",
+        entradas=(Entrada("lado", "Digite o lado:"),),
+        calcular=_area_quadrado,
+        mensagem=_mensagem_area,
+        passos=_passos_area_quadrado,
+        botao="Calcular Área do Quadrado",
+    ),
+    Formula(
+        nome="Área do Retângulo",
+        grupo=AREAS,
+        opcao="Retângulo",
+        entradas=(Entrada("base", "Base:"), Entrada("altura", "Altura:")),
+        calcular=_area_retangulo,
+        mensagem=_mensagem_area,
+        passos=_passos_area_retangulo,
+        botao="Calcular Área do Retângulo",
+    ),
+    Formula(
+        nome="Área do Triângulo",
+        grupo=AREAS,
+        opcao="Triângulo",
+        entradas=(Entrada("base", "Base:"), Entrada("altura", "Altura:")),
+        calcular=_area_triangulo,
+        mensagem=_mensagem_area,
+        passos=_passos_area_triangulo,
+        botao="Calcular Área do Triângulo",
+    ),
+    Formula(
+        nome="Área do Círculo",
+        grupo=AREAS,
+        opcao="Círculo",
+        entradas=(Entrada("raio", "Raio:"),),
+        calcular=_area_circulo,
+        mensagem=_mensagem_area,
+        passos=_passos_area_circulo,
+        botao="Calcular Área do Círculo",
+    ),
+    Formula(
+        nome="Força Gravitacional",
+        titulo="Força Gravitacional: F = G * (m1 * m2) / d²",
+        entradas=(
+            Entrada("m1", "Massa 1 (kg):", "kg"),
+            Entrada("m2", "Massa 2 (kg):", "kg"),
+            Entrada("distancia", "Distância (m):", "m"),
+        ),
+        calcular=_forca_gravitacional,
+        mensagem=lambda v, r: f"A força gravitacional é {r['forca']:.4e} N",
+        passos=_passos_forca_gravitacional,
+        botao="Calcular Força Gravitacional",
+    ),
+    Formula(
+        nome="Torricelli",
+        titulo="Torricelli: v² = v₀² + 2*a*Δs",
+        entradas=(
+            Entrada("v0", "Velocidade inicial (v₀):", "m/s"),
+            Entrada("a", "Aceleração (a):", "m/s²"),
+            Entrada("s", "Deslocamento (Δs):", "m"),
+        ),
+        calcular=_torricelli,
+        mensagem=lambda v, r: f"A velocidade final é {r['velocidade']:.2f} m/s",
+        passos=_passos_torricelli,
+        botao="Calcular Velocidade Final",
+    ),
+    Formula(
+        nome="Carga Elétrica",
+        titulo="Carga Elétrica: Q = n * e",
+        entradas=(Entrada("n", "Número de elétrons (n):"),),
+        calcular=_carga,
+        mensagem=lambda v, r: f"A carga elétrica é {r['carga']:.4e} C",
+        passos=_passos_carga,
+        botao="Calcular Carga",
+    ),
+    Formula(
+        nome="Tempo",
+        titulo="Tempo: t = d / v",
+        entradas=(
+            Entrada("d", "Distância (d):", "m"),
+            Entrada("v", "Velocidade (v):", "m/s"),
+        ),
+        calcular=_tempo,
+        mensagem=lambda v, r: f"O tempo é {r['tempo']:.2f} s",
+        passos=_passos_tempo,
+        botao="Calcular Tempo",
+    ),
+]
+
+FORMULAS = {formula.nome: formula for formula in _LISTA}
+
+
+def opcoes():
+    """Itens do seletor principal: fórmulas avulsas e grupos, na ordem do registro."""
+    itens = []
+    for formula in _LISTA:
+        item = formula.grupo or formula.nome
+        if item not in itens:
+            itens.append(item)
+    return itens
+
+
+def do_grupo(item):
+    """Fórmulas de um item do seletor principal."""
+    return [f for f in _LISTA if (f.grupo or f.nome) == item]
+
+
+class CacheLRU:
+    """Cache LRU com tamanho máximo e tempo de vida (em segundos) por item."""
+
+    def __init__(self, tamanho, ttl):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and time.monotonic() - item[0] <= self.ttl:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._itens[chave]
+            self.misses += 1
+            return None
+
+    def put(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic(), valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "itens": len(self._itens)}
+
+
+_cache = CacheLRU(CACHE_TAMANHO, CACHE_TTL)
+
+
+def calcular_com_passos(nome, **valores):
+    """Como avaliar(), mas devolve (resultado, passo a passo) e guarda ambos em cache.
+
+    A chave usa repr() de cada entrada já convertida para float, que é
+    exatamente o texto mostrado no passo a passo (distingue 0.0 de -0.0).
+    """
+    formula = FORMULAS[nome]
+    valores = {e.nome: float(valores[e.nome]) for e in formula.entradas}
+    chave = (nome, tuple(repr(v) for v in valores.values()))
+
+    item = _cache.get(chave)
+    if item is None:
+        try:
+            resultado = formula.calcular(**valores)
+            item = (resultado, formula.passos(valores, resultado), None)
+        except DominioError as e:
+            item = (None, None, str(e))
+        _cache.put(chave, item)
+
+    resultado, passos, erro = item
+    if erro is not None:
+        raise DominioError(erro)
+    return dict(resultado), passos
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def avaliar(nome, **valores):
+    """Calcula a fórmula pelo nome. Lança DominioError para entradas inválidas."""
+    formula = FORMULAS[nome]
+    faltando = [e.nome for e in formula.entradas if e.nome not in valores]
+    if faltando:
+        raise TypeError(f"Entradas ausentes: {', '.join(faltando)}")
+    valores = {e.nome: float(valores[e.nome]) for e in formula.entradas}
+    return formula.calcular(**valores)
+
+
+def _decimal(valor):
+    if isinstance(valor, Fraction):
+        return Decimal(valor.numerator) / Decimal(valor.denominator)
+    if isinstance(valor, Decimal):
+        return valor
+    # Pelo texto: 0.1 vira exatamente 0.1, e não o binário mais próximo
+    return Decimal(str(valor))
+
+
+def avaliar_preciso(nome, digitos=PRECISAO_DIGITOS, **valores):
+    """Como avaliar(), mas em Decimal com `digitos` algarismos significativos.
+
+    As entradas podem ser float, int, str, Decimal ou Fraction. Os
+    resultados numéricos vêm como Decimal.
+    """
+    formula = FORMULAS[nome]
+    faltando = [e.nome for e in formula.entradas if e.nome not in valores]
+    if faltando:
+        raise TypeError(f"Entradas ausentes: {', '.join(faltando)}")
+    with localcontext() as ctx:
+        ctx.prec = int(digitos)
+        entradas = {e.nome: _decimal(valores[e.nome]) for e in formula.entradas}
+        resultado = formula.calcular(**entradas)
+        # Arredonda para a precisão pedida também o que não passou por uma operação
+        return {k: +v if isinstance(v, Decimal) else v for k, v in resultado.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula uma fórmula da calculadora")
+    parser.add_argument("formula", nargs="?", help="nome da fórmula (omita para listar)")
+    parser.add_argument("valores", nargs="*", help="entradas no formato nome=valor")
+    parser.add_argument("--passos", action="store_true", help="mostra o passo a passo em LaTeX")
+    parser.add_argument("--digitos", type=int, help="calcula em alta precisão com esse número de algarismos")
+    args = parser.parse_args()
+
+    if not args.formula:
+        for formula in _LISTA:
+            entradas = ", ".join(f"{e.nome} ({e.unidade})" if e.unidade else e.nome for e in formula.entradas)
+            print(f"{formula.nome}: {entradas}")
+        return
+
+    if args.formula not in FORMULAS:
+        parser.error(f"fórmula desconhecida: {args.formula}")
+    malformados = [item for item in args.valores if "=" not in item]
+    if malformados:
+        parser.error(f"use nome=valor: {', '.join(malformados)}")
+    valores = dict(item.split("=", 1) for item in args.valores)
+    faltando = [e.nome for e in FORMULAS[args.formula].entradas if e.nome not in valores]
+    if faltando:
+        parser.error(f"entradas ausentes: {', '.join(faltando)}")
+    for nome, valor in valores.items():
+        try:
+            float(valor)
+        except ValueError:
+            parser.error(f"valor não numérico para {nome}: {valor}")
+    try:
+        resultado = avaliar(args.formula, **valores)
+        if args.digitos:
+            preciso = avaliar_preciso(args.formula, args.digitos, **valores)
+    except DominioError as e:
+        parser.exit(1, f"{e}\n")
+    print(json.dumps(resultado, ensure_ascii=False))
+    if args.digitos:
+        print(json.dumps(preciso, ensure_ascii=False, default=str))
+    if args.passos:
+        valores = {k: float(v) for k, v in valores.items()}
+        print(FORMULAS[args.formula].passos(valores, resultado))
+
+
+if __name__ == "__main__":
+    main()
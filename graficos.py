@@ -0,0 +1,137 @@
+"""Gráficos das fórmulas, gerados no servidor.
+
+Uma entrada da fórmula é variada num intervalo, com as demais fixas, e
+a curva é calculada de uma vez pelas funções vetorizadas de
+calculos_lote. Para a Fórmula de Bhaskara o gráfico é a própria
+parábola, com as raízes marcadas.
+
+Intervalos com muitos pontos são reduzidos antes de desenhar: cada
+faixa de pontos vira só o seu mínimo e máximo, o que mantém picos e
+descontinuidades visíveis com no máximo PONTOS_DESENHO pontos. As
+imagens prontas ficam num cache LRU indexado pelos parâmetros.
+"""
+import io
+import os
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from calculos_lote import FORMULAS_LOTE
+from formulas import FORMULAS, CacheLRU
+
+# Aproximadamente duas vezes a largura do gráfico em pixels
+PONTOS_DESENHO = 2000
+# Acima disso a redução já não mostra nada novo na imagem; limita o custo
+# de cada pedido a alguns milissegundos e poucos MB
+MAX_PONTOS = 50 * PONTOS_DESENHO
+
+_cache = CacheLRU(
+    int(os.environ.get("CALC_CACHE_GRAFICOS", 256)),
+    float(os.environ.get("CALC_CACHE_GRAFICOS_TTL", 3600)),
+)
+
+# Coluna de resultado desenhada e rótulo do eixo y de cada fórmula
+SAIDAS = {
+    "Velocidade Média": ("velocidade", "v (m/s)"),
+    "Força Resultante": ("forca", "F (N)"),
+    "Corrente Elétrica": ("corrente", "I (A)"),
+    "Área do Quadrado": ("area", "A"),
+    "Área do Retângulo": ("area", "A"),
+    "Área do Triângulo": ("area", "A"),
+    "Área do Círculo": ("area", "A"),
+    "Força Gravitacional": ("forca", "F (N)"),
+    "Torricelli": ("velocidade", "v (m/s)"),
+    "Carga Elétrica": ("carga", "Q (C)"),
+    "Tempo": ("tempo", "t (s)"),
+}
+
+
+def reduzir(x, y, pontos=PONTOS_DESENHO):
+    """Reduz (x, y) a no máximo `pontos` pontos, guardando mínimo e máximo de cada faixa."""
+    faixas = pontos // 2
+    if len(x) <= pontos:
+        return x, y
+    n = len(x) // faixas * faixas
+    yb = y[:n].reshape(faixas, -1)
+    xb = x[:n].reshape(faixas, -1)
+    # Pontos inválidos (NaN) são ignorados; faixas só com NaN continuam NaN
+    nan = np.isnan(yb)
+    ymin = np.where(nan, np.inf, yb).argmin(axis=1)
+    ymax = np.where(nan, -np.inf, yb).argmax(axis=1)
+    linhas = np.arange(faixas)
+    # Mantém a ordem em x dentro de cada faixa
+    i1 = np.minimum(ymin, ymax)
+    i2 = np.maximum(ymin, ymax)
+    xs = np.column_stack([xb[linhas, i1], xb[linhas, i2]]).ravel()
+    ys = np.column_stack([yb[linhas, i1], yb[linhas, i2]]).ravel()
+    return np.append(xs, x[-1]), np.append(ys, y[-1])
+
+
+def _limitar(pontos):
+    return int(min(max(pontos, 2), MAX_PONTOS))
+
+
+def varrer(nome, valores, variavel, inicio, fim, pontos):
+    """Calcula a curva da fórmula variando `variavel` de `inicio` a `fim`."""
+    pontos = _limitar(pontos)
+    x = np.linspace(inicio, fim, pontos)
+    if nome == "Fórmula de Bhaskara":
+        return x, valores["a"] * x**2 + valores["b"] * x + valores["c"]
+    entradas = {
+        e.nome: x if e.nome == variavel else np.full(pontos, float(valores[e.nome]))
+        for e in FORMULAS[nome].entradas
+    }
+    resultados, _ = FORMULAS_LOTE[nome](entradas)
+    return x, np.asarray(resultados[SAIDAS[nome][0]], dtype=float)
+
+
+def grafico_png(nome, valores, variavel, inicio, fim, pontos=PONTOS_DESENHO):
+    """PNG do gráfico, vindo do cache quando os parâmetros se repetem."""
+    chave = (
+        nome, tuple(sorted((k, float(v)) for k, v in valores.items())),
+        variavel, float(inicio), float(fim), _limitar(pontos),
+    )
+    png = _cache.get(chave)
+    if png is None:
+        png = _desenhar(nome, valores, variavel, inicio, fim, pontos)
+        _cache.put(chave, png)
+    return png
+
+
+def _desenhar(nome, valores, variavel, inicio, fim, pontos):
+    x, y = varrer(nome, valores, variavel, inicio, fim, pontos)
+    x, y = reduzir(x, y)
+
+    # Figure direto (sem pyplot) é seguro entre as threads do Streamlit
+    fig = Figure(figsize=(7, 4), dpi=100)
+    ax = fig.add_subplot()
+    ax.plot(x, y, linewidth=1.5)
+    ax.grid(True, alpha=0.3)
+
+    if nome == "Fórmula de Bhaskara":
+        ax.axhline(0, color="gray", linewidth=0.8)
+        ax.set_xlabel("x")
+        ax.set_ylabel("y = ax² + bx + c")
+        try:
+            resultado = FORMULAS[nome].calcular(**valores)
+        except ValueError:
+            resultado = {}
+        raizes = [resultado[k] for k in ("x1", "x2") if k in resultado]
+        if raizes:
+            ax.plot(raizes, [0] * len(raizes), "o", color="red", label="raízes")
+            ax.legend()
+    else:
+        entrada = next(e for e in FORMULAS[nome].entradas if e.nome == variavel)
+        ax.set_xlabel(f"{variavel} ({entrada.unidade})" if entrada.unidade else variavel)
+        ax.set_ylabel(SAIDAS[nome][1])
+    ax.set_title(nome)
+    # Margens fixas: tight_layout custa quase metade do tempo de desenho
+    fig.subplots_adjust(left=0.12, right=0.97, top=0.92, bottom=0.13)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def cache_stats():
+    return _cache.stats()
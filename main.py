@@ -1,323 +1,216 @@
 import streamlit as st
-import json
 import uuid
-import bcrypt
-import os
+from contextlib import contextmanager
 
-# Carrega ou cria arquivo de dados
-if not os.path.exists("users.json"):
-    with open("users.json", "w") as f:
-        json.dump({}, f)
+import metricas
 
-def load_users():
-    with open("users.json", "r") as f:
-        return json.load(f)
+# Os módulos de cada página (auth, formulas, storage, calculos_lote) são
+# importados dentro das funções que os usam, para que a primeira
+# renderização carregue apenas o necessário para a página aberta.
 
-def save_users(users):
-    with open("users.json", "w") as f:
-        json.dump(users, f, indent=4)
+def _backend():
+    # O arquivo de dados só é aberto (ou criado) no primeiro acesso
+    import storage
+    return storage.get_backend()
 
-def hash_password(password):
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+@metricas.cronometrado("load_user")
+def load_user(user_id):
+    return _backend().get(user_id)
 
-def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+@metricas.cronometrado("load_users_by_id")
+def load_users_by_id(user_ids):
+    return _backend().get_many(user_ids)
+
+@metricas.cronometrado("find_user_id")
+def find_user_id(username):
+    return _backend().find_id(username)
+
+@contextmanager
+def update_users(user_ids):
+    # Lê, altera e grava apenas os registros indicados numa única transação
+    with metricas.medir("update_users"), _backend().transaction(user_ids) as records:
+        yield records
 
 # ---------------- Funções de cálculo ---------------- #
 
-import streamlit as st
+def aba_calculos_lote():
+    # Importado só aqui para não carregar NumPy/pandas nas outras páginas
+    import calculos_lote
+    import formulas
+
+    escolha = st.selectbox("Escolha o tipo de cálculo:", list(formulas.FORMULAS))
+    colunas = [entrada.nome for entrada in formulas.FORMULAS[escolha].entradas]
+    st.write(f"O arquivo deve ter as colunas: {', '.join(f'`{col}`' for col in colunas)}")
+
+    arquivo = st.file_uploader("Arquivo de entrada", type=["csv", "parquet"])
+    if arquivo is not None and st.button("Calcular Lote"):
+        try:
+            tabela = calculos_lote.ler_tabela(arquivo.name, arquivo.getvalue())
+            saida = calculos_lote.calcular_lote(escolha, tabela)
+        except ValueError as e:
+            st.error(str(e))
+            st.session_state.pop("lote", None)
+            return
+        # Guardado para os reruns do download; os arquivos são gerados sob demanda
+        st.session_state["lote"] = {"saida": saida, "arquivos": {}}
+
+    lote = st.session_state.get("lote")
+    if lote is None:
+        return
+    saida = lote["saida"]
+    invalidas = int((saida["erro"] != "").sum())
+    st.success(f"{len(saida)} linhas calculadas ({invalidas} com erro).")
+    st.dataframe(saida.head(1000))
+    formato = st.radio("Formato do resultado:", ["Parquet", "CSV"], horizontal=True)
+    extensao = formato.lower()
+    if extensao not in lote["arquivos"] and st.button(f"Gerar arquivo {formato}"):
+        lote["arquivos"][extensao] = calculos_lote.exportar(saida, extensao)
+    if extensao in lote["arquivos"]:
+        st.download_button(
+            f"Baixar resultado ({formato})",
+            lote["arquivos"][extensao],
+            file_name=f"resultado.{extensao}",
+            mime="text/csv" if extensao == "csv" else "application/octet-stream",
+        )
 
 def aba_calculos():
+    import formulas
+
     st.header("🧮 Cálculos Físico-Matemáticos")
 
-    opcoes = [
-        "Velocidade Média",
-        "Força Resultante",
-        "Fórmula de Bhaskara",
-        "Corrente Elétrica",
-        "Área de Figuras Geométricas",
-        "Força Gravitacional",
-        "Torricelli",
-        "Carga Elétrica",
-        "Tempo"
-    ]
-    
-    escolha = st.selectbox("Escolha o tipo de cálculo:", opcoes)
-
-    if escolha == "Velocidade Média":
-        st.subheader("Velocidade Média: v = Δs / Δt")
-        distancia = st.number_input("Digite a distância (Δs) em metros:", step=1.0)
-        tempo = st.number_input("Digite o tempo (Δt) em segundos:", step=1.0)
-        if st.button("Calcular Velocidade"):
-            if tempo != 0:
-                velocidade = distancia / tempo
-                # Exibição do cálculo passo a passo
-                steps = f"\n## Cálculo da Velocidade Média (m/s)\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$v = \\frac{{\\Delta s}}{{\\Delta t}}$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$v = \\frac{{{distancia}}}{{{tempo}}}$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$v = {velocidade:.2f} \\text{{ m/s}}$$\n"
-                st.markdown(steps)
-                st.success(f"A velocidade média é {velocidade:.2f} m/s")
-            else:
-                st.error("O tempo não pode ser zero!")
-
-    elif escolha == "Força Resultante":
-        st.subheader("Força Resultante: F = m * a")
-        massa = st.number_input("Digite a massa (m) em kg:", step=1.0)
-        aceleracao = st.number_input("Digite a aceleração (a) em m/s²:", step=1.0)
-        if st.button("Calcular Força"):
-            forca = massa * aceleracao
-            steps = f"\n## Cálculo da Força Resultante (N)\n" \
-                    f"\n### Fórmula\n" \
-                    f"\n$$F = m \\times a$$\n" \
-                    f"\n### Substituindo os valores\n" \
-                    f"\n$$F = {massa} \\times {aceleracao}$$\n" \
-                    f"\n### Resultado\n" \
-                    f"\n$$F = {forca:.2f} \\text{{ N}}$$\n"
-            st.markdown(steps)
-            st.success(f"A força resultante é {forca:.2f} N")
-
-    elif escolha == "Fórmula de Bhaskara":
-        st.subheader("Bhaskara: ax² + bx + c = 0")
-        a = st.number_input("Digite o valor de a:")
-        b = st.number_input("Digite o valor de b:")
-        c = st.number_input("Digite o valor de c:")
-        if st.button("Calcular Bhaskara"):
-            delta = b**2 - 4*a*c
-            steps = f"\n## Cálculo das Raízes pela Fórmula de Bhaskara\n" \
-                    f"\n### Fórmula\n" \
-                    f"\n$$x = \\frac{{-b \\pm \\sqrt{{b^2 - 4ac}}}}{{2a}}$$\n" \
-                    f"\n### Cálculo do Discriminante (Δ)\n" \
-                    f"\n$$\\Delta = b^2 - 4ac$$\n" \
-                    f"\n$$\\Delta = {b}^2 - 4 \\times {a} \\times {c}$$\n" \
-                    f"\n$$\\Delta = {delta:.2f}$$\n"
-            
-            if delta < 0:
-                steps += f"\n### Resultado\n" \
-                         f"\nNão existem raízes reais (Δ < 0)\n"
-                st.markdown(steps)
-                st.warning("Não existem raízes reais.")
-            else:
-                x1 = (-b + delta**0.5) / (2*a)
-                x2 = (-b - delta**0.5) / (2*a)
-                steps += f"\n### Cálculo das Raízes\n" \
-                         f"\n$$x_1 = \\frac{{-b + \\sqrt{{\\Delta}}}}{{2a}} = \\frac{{-{b} + \\sqrt{{{delta:.2f}}}}}{{2 \\times {a}}} = {x1:.2f}$$\n" \
-                         f"\n$$x_2 = \\frac{{-b - \\sqrt{{\\Delta}}}}{{2a}} = \\frac{{-{b} - \\sqrt{{{delta:.2f}}}}}{{2 \\times {a}}} = {x2:.2f}$$\n" \
-                         f"\n### Resultado\n" \
-                         f"\n$$x_1 = {x1:.2f}$$\n" \
-                         f"\n$$x_2 = {x2:.2f}$$\n"
-                st.markdown(steps)
-                st.success(f"x₁ = {x1:.2f}, x₂ = {x2:.2f}")
-
-    elif escolha == "Corrente Elétrica":
-        st.subheader("Corrente Elétrica: I = Q / Δt")
-        carga = st.number_input("Digite a carga elétrica (Q) em Coulombs:", step=1.0)
-        tempo = st.number_input("Digite o tempo (Δt) em segundos:", step=1.0)
-        if st.button("Calcular Corrente"):
-            if tempo != 0:
-                corrente = carga / tempo
-                steps = f"\n## Cálculo da Corrente Elétrica (A)\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$I = \\frac{{Q}}{{\\Delta t}}$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$I = \\frac{{{carga}}}{{{tempo}}}$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$I = {corrente:.2f} \\text{{ A}}$$\n"
-                st.markdown(steps)
-                st.success(f"A corrente elétrica é {corrente:.2f} A")
-            else:
-                st.error("O tempo não pode ser zero!")
-
-    elif escolha == "Área de Figuras Geométricas":
-        figura = st.selectbox("Escolha a figura:", ["Quadrado", "Retângulo", "Triângulo", "Círculo"])
-        if figura == "Quadrado":
-            lado = st.number_input("Digite o lado:", step=1.0)
-            if st.button("Calcular Área do Quadrado"):
-                area = lado ** 2
-                steps = f"\n## Cálculo da Área do Quadrado\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$A = lado^2$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$A = {lado}^2$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$A = {area:.2f}$$\n"
-                st.markdown(steps)
-                st.success(f"A área é {area:.2f}")
-        elif figura == "Retângulo":
-            base = st.number_input("Base:", step=1.0)
-            altura = st.number_input("Altura:", step=1.0)
-            if st.button("Calcular Área do Retângulo"):
-                area = base * altura
-                steps = f"\n## Cálculo da Área do Retângulo\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$A = base \\times altura$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$A = {base} \\times {altura}$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$A = {area:.2f}$$\n"
-                st.markdown(steps)
-                st.success(f"A área é {area:.2f}")
-        elif figura == "Triângulo":
-            base = st.number_input("Base:", step=1.0)
-            altura = st.number_input("Altura:", step=1.0)
-            if st.button("Calcular Área do Triângulo"):
-                area = (base * altura) / 2
-                steps = f"\n## Cálculo da Área do Triângulo\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$A = \\frac{{base \\times altura}}{{2}}$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$A = \\frac{{{base} \\times {altura}}}{{2}}$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$A = {area:.2f}$$\n"
-                st.markdown(steps)
-                st.success(f"A área é {area:.2f}")
-        elif figura == "Círculo":
-            raio = st.number_input("Raio:", step=1.0)
-            if st.button("Calcular Área do Círculo"):
-                area = 3.1416 * raio ** 2
-                steps = f"\n## Cálculo da Área do Círculo\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$A = \\pi \\times raio^2$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$A = 3.1416 \\times {raio}^2$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$A = {area:.2f}$$\n"
-                st.markdown(steps)
-                st.success(f"A área é {area:.2f}")
-
-    elif escolha == "Força Gravitacional":
-        st.subheader("Força Gravitacional: F = G * (m1 * m2) / d²")
-        G = 6.67430e-11
-        m1 = st.number_input("Massa 1 (kg):", step=1.0)
-        m2 = st.number_input("Massa 2 (kg):", step=1.0)
-        distancia = st.number_input("Distância (m):", step=1.0)
-        if st.button("Calcular Força Gravitacional"):
-            if distancia != 0:
-                Fg = G * (m1 * m2) / distancia**2
-                steps = f"\n## Cálculo da Força Gravitacional (N)\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$F = G \\times \\frac{{m_1 \\times m_2}}{{d^2}}$$\n" \
-                        f"\n### Constante Gravitacional\n" \
-                        f"\n$$G = 6.67430 \\times 10^{{-11}} \\text{{ Nm}}^2/\\text{{kg}}^2$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$F = 6.67430 \\times 10^{{-11}} \\times \\frac{{{m1} \\times {m2}}}{{{distancia}^2}}$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$F = {Fg:.4e} \\text{{ N}}$$\n"
-                st.markdown(steps)
-                st.success(f"A força gravitacional é {Fg:.4e} N")
-            else:
-                st.error("A distância não pode ser zero!")
-
-    elif escolha == "Torricelli":
-        st.subheader("Torricelli: v² = v₀² + 2*a*Δs")
-        v0 = st.number_input("Velocidade inicial (v₀):", step=1.0)
-        a = st.number_input("Aceleração (a):", step=1.0)
-        s = st.number_input("Deslocamento (Δs):", step=1.0)
-        if st.button("Calcular Velocidade Final"):
-            vf2 = v0**2 + 2*a*s
-            if vf2 >= 0:
-                vf = vf2 ** 0.5
-                steps = f"\n## Cálculo da Velocidade Final (Torricelli)\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$v^2 = v_0^2 + 2 \\times a \\times \\Delta s$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$v^2 = {v0}^2 + 2 \\times {a} \\times {s}$$\n" \
-                        f"\n$$v^2 = {v0**2:.2f} + {2*a*s:.2f}$$\n" \
-                        f"\n$$v^2 = {vf2:.2f}$$\n" \
-                        f"\n$$v = \\sqrt{{{vf2:.2f}}}$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$v = {vf:.2f} \\text{{ m/s}}$$\n"
-                st.markdown(steps)
-                st.success(f"A velocidade final é {vf:.2f} m/s")
-            else:
-                steps = f"\n## Cálculo da Velocidade Final (Torricelli)\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$v^2 = v_0^2 + 2 \\times a \\times \\Delta s$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$v^2 = {v0}^2 + 2 \\times {a} \\times {s}$$\n" \
-                        f"\n$$v^2 = {v0**2:.2f} + {2*a*s:.2f}$$\n" \
-                        f"\n$$v^2 = {vf2:.2f}$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\nNão existe solução real (raiz quadrada de número negativo)\n"
-                st.markdown(steps)
-                st.warning("Resultado inválido (velocidade imaginária).")
-
-    elif escolha == "Carga Elétrica":
-        st.subheader("Carga Elétrica: Q = n * e")
-        n = st.number_input("Número de elétrons (n):", step=1.0)
-        e = 1.6e-19  # Carga elementar
-        if st.button("Calcular Carga"):
-            Q = n * e
-            steps = f"\n## Cálculo da Carga Elétrica (C)\n" \
-                    f"\n### Fórmula\n" \
-                    f"\n$$Q = n \\times e$$\n" \
-                    f"\n### Carga Elementar\n" \
-                    f"\n$$e = 1.6 \\times 10^{{-19}} \\text{{ C}}$$\n" \
-                    f"\n### Substituindo os valores\n" \
-                    f"\n$$Q = {n} \\times 1.6 \\times 10^{{-19}}$$\n" \
-                    f"\n### Resultado\n" \
-                    f"\n$$Q = {Q:.4e} \\text{{ C}}$$\n"
-            st.markdown(steps)
-            st.success(f"A carga elétrica é {Q:.4e} C")
-
-    elif escolha == "Tempo":
-        st.subheader("Tempo: t = d / v")
-        d = st.number_input("Distância (d):", step=1.0)
-        v = st.number_input("Velocidade (v):", step=1.0)
-        if st.button("Calcular Tempo"):
-            if v != 0:
-                t = d / v
-                steps = f"\n## Cálculo do Tempo (s)\n" \
-                        f"\n### Fórmula\n" \
-                        f"\n$$t = \\frac{{d}}{{v}}$$\n" \
-                        f"\n### Substituindo os valores\n" \
-                        f"\n$$t = \\frac{{{d}}}{{{v}}}$$\n" \
-                        f"\n### Resultado\n" \
-                        f"\n$$t = {t:.2f} \\text{{ s}}$$\n"
-                st.markdown(steps)
-                st.success(f"O tempo é {t:.2f} s")
+    modo = st.radio("Modo:", ["Individual", "Lote (CSV/Parquet)"], horizontal=True)
+    if modo != "Individual":
+        aba_calculos_lote()
+        return
+
+    escolha = st.selectbox("Escolha o tipo de cálculo:", formulas.opcoes())
+
+    opcoes = formulas.do_grupo(escolha)
+    if escolha in formulas.GRUPOS:
+        opcao = st.selectbox(formulas.GRUPOS[escolha], [f.opcao for f in opcoes])
+        formula = next(f for f in opcoes if f.opcao == opcao)
+    else:
+        formula = opcoes[0]
+
+    if formula.titulo:
+        st.subheader(formula.titulo)
+    valores = {}
+    for entrada in formula.entradas:
+        if entrada.step is None:
+            valores[entrada.nome] = st.number_input(entrada.rotulo)
+        else:
+            valores[entrada.nome] = st.number_input(entrada.rotulo, step=entrada.step)
+
+    col1, col2 = st.columns(2)
+    preciso = col1.checkbox("Alta precisão")
+    digitos = col2.number_input("Dígitos:", min_value=10, max_value=1000,
+                                value=formulas.PRECISAO_DIGITOS, disabled=not preciso)
+
+    if st.button(formula.botao):
+        try:
+            resultado, passos = formulas.calcular_com_passos(formula.nome, **valores)
+        except formulas.DominioError as e:
+            st.error(str(e))
+        else:
+            # Exibição do cálculo passo a passo
+            st.markdown(passos)
+            if "aviso" in resultado:
+                st.warning(resultado["aviso"])
             else:
-                st.error("A velocidade não pode ser zero!")
+                st.success(formula.mensagem(valores, resultado))
+            if preciso:
+                # Mesmo cálculo em Decimal, com todos os algarismos pedidos
+                exato = formulas.avaliar_preciso(formula.nome, digitos, **valores)
+                st.code("\n".join(f"{k} = {v}" for k, v in exato.items() if k != "aviso"))
+
+    with st.expander("📈 Gráfico"):
+        mostrar_grafico(formula, valores)
+
+def mostrar_grafico(formula, valores):
+    if formula.nome == "Fórmula de Bhaskara":
+        variavel = "x"
+        st.write("Parábola y = ax² + bx + c com as raízes marcadas.")
+    else:
+        nomes = {e.rotulo: e.nome for e in formula.entradas}
+        variavel = nomes[st.selectbox("Variar:", list(nomes))]
+    col1, col2, col3 = st.columns(3)
+    inicio = col1.number_input("De:", value=-10.0)
+    fim = col2.number_input("Até:", value=10.0)
+    # Mesmo limite de graficos.MAX_PONTOS, que só é importado ao gerar o gráfico
+    pontos = col3.number_input("Pontos:", min_value=2, max_value=100_000, value=1000, step=1000)
+    if st.button("Gerar gráfico"):
+        if fim <= inicio:
+            st.error("O fim do intervalo deve ser maior que o início!")
+        else:
+            # Importado só aqui: NumPy e matplotlib são pesados e só servem ao gráfico
+            import graficos
+
+            st.image(graficos.grafico_png(formula.nome, valores, variavel, inicio, fim, pontos))
 
 
 # ---------------- Autenticação ---------------- #
 
 def login():
+    import auth
+
     st.subheader("Login")
     username = st.text_input("Usuário")
     password = st.text_input("Senha", type="password")
     if st.button("Entrar"):
-        users = load_users()
-        for user in users.values():
-            if isinstance(user, dict) and user.get("username") == username and check_password(password, user.get("password", "")):
-                st.session_state["logged_user"] = user  # Aqui guarda o dicionário inteiro do usuário logado
-                st.success("Login bem-sucedido!")
-                st.rerun()
-                return
+        user_id = find_user_id(username)
+        user = load_user(user_id) if user_id else None
+        try:
+            auth.check_rate_limit(username)
+            ok = user is not None and auth.check_password(password, user.get("password", ""))
+            if ok and auth.needs_rehash(user["password"]):
+                # O custo do bcrypt mudou: refaz o hash com a senha já validada
+                user["password"] = auth.hash_password(password)
+                with update_users([user_id]) as records:
+                    records[user_id]["password"] = user["password"]
+        except auth.RateLimitError:
+            st.error("Muitas tentativas de login. Aguarde um pouco e tente novamente.")
+            return
+        except auth.AuthBusyError:
+            st.error("Servidor ocupado. Tente novamente em instantes.")
+            return
+        if ok:
+            st.session_state["logged_user"] = user  # Aqui guarda o dicionário inteiro do usuário logado
+            st.success("Login bem-sucedido!")
+            st.rerun()
+            return
         st.error("Usuário ou senha incorretos.")
 
 def register():
+    import auth
+    import storage
+
     st.subheader("Registrar")
     username = st.text_input("Novo usuário")
     password = st.text_input("Nova senha", type="password")
     if st.button("Registrar"):
-        users = load_users()
-        if any(user.get("username") == username for user in users.values() if isinstance(user, dict)):
+        if find_user_id(username) is not None:
             st.error("Usuário já existe.")
         else:
             user_id = str(uuid.uuid4())
-            users[user_id] = {
-                "id": user_id,
-                "username": username,
-                "password": hash_password(password),
-                "amigos": [],
-                "notificacoes": [],
-                "anotacao": ""
-            }
-            save_users(users)
+            try:
+                hashed = auth.hash_password(password)
+            except auth.AuthBusyError:
+                st.error("Servidor ocupado. Tente novamente em instantes.")
+                return
+            try:
+                with update_users([user_id]) as records:
+                    records[user_id] = {
+                        "id": user_id,
+                        "username": username,
+                        "password": hashed,
+                        "amigos": [],
+                        "notificacoes": [],
+                        "anotacao": ""
+                    }
+            except storage.UsernameExistsError:
+                # Outra sessão registrou o mesmo nome entre a verificação e a escrita
+                st.error("Usuário já existe.")
+                return
             st.success("Registrado com sucesso! Faça login.")
 
 
@@ -329,64 +222,114 @@ def logout():
 # ---------------- Interface ---------------- #
 
 def show_notificacoes(logged_user):
+    import amigos
+    import notificacoes
+
     st.subheader("Notificações")
     
-    # Carrega todos os usuários
-    users = load_users()
+    # Carrega apenas o usuário logado
+    user = load_user(logged_user["id"])
     
     # Verifica se o usuário logado existe no sistema
-    if logged_user["id"] not in users:
+    if user is None:
         st.error("Erro: seu usuário não foi encontrado no sistema!")
         return
     
-    user = users[logged_user["id"]]
-    
-    # Garante que o usuário tem a lista de notificações
-    if "notificacoes" not in user:
-        user["notificacoes"] = []
+    # Pedidos gravados no formato antigo, dentro do registro, vão para a fila
+    if user.get("notificacoes"):
+        notificacoes.importar_legado(user["id"])
     
     # Verifica se há notificações
-    if not user["notificacoes"]:
+    pendentes = notificacoes.pedidos_pendentes(user["id"])
+    if not pendentes:
         st.info("Você não tem notificações no momento.")
         return
     
+    # Paginação da caixa de entrada
+    paginas = -(-len(pendentes) // amigos.PEDIDOS_POR_PAGINA)
+    pagina = 1
+    st.write(f"Você tem {len(pendentes)} pedido(s) de amizade.")
+    if paginas > 1:
+        pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1)
+    inicio = (pagina - 1) * amigos.PEDIDOS_POR_PAGINA
+    ids = pendentes[inicio:inicio + amigos.PEDIDOS_POR_PAGINA]
+    
+    # Carrega de uma vez só os usuários que enviaram pedidos desta página
+    solicitantes = load_users_by_id(ids)
+    if len(solicitantes) < len(ids):
+        # IDs inválidos são removidos em segundo plano, sem gravar aqui
+        amigos.agendar_limpeza(user["id"])
+    ids = [i for i in ids if i in solicitantes]
+    nomes = {i: solicitantes[i]["username"] for i in ids}
+    
+    # Ações em lote: uma única gravação para todos os selecionados
+    selecionados = st.multiselect(
+        "Selecionar pedidos:", ids, format_func=nomes.get, key=f"selecao_{pagina}"
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Aceitar selecionados", disabled=not selecionados):
+            amigos.aceitar_pedidos(user["id"], selecionados)
+            st.success(f"{len(selecionados)} pedido(s) aceito(s)!")
+            st.rerun()
+    with col2:
+        if st.button("Recusar selecionados", disabled=not selecionados):
+            amigos.recusar_pedidos(user["id"], selecionados)
+            st.info(f"{len(selecionados)} pedido(s) recusado(s).")
+            st.rerun()
+    
     # Processa cada notificação
-    for solicitante_id in user["notificacoes"].copy():  # Usamos copy() para iterar sobre uma cópia
-        if solicitante_id not in users:
-            # Remove IDs inválidos
-            user["notificacoes"].remove(solicitante_id)
-            continue
-            
-        solicitante = users[solicitante_id]
-        st.markdown(f"**{solicitante['username']}** quer ser seu amigo.")
+    for solicitante_id in ids:
+        nome = nomes[solicitante_id]
+        st.markdown(f"**{nome}** quer ser seu amigo.")
         
         col1, col2 = st.columns(2)
         with col1:
-            if st.button(f"Aceitar {solicitante['username']}", key=f"aceitar_{solicitante_id}"):
-                # Adiciona como amigo em ambos os usuários
-                if "amigos" not in user:
-                    user["amigos"] = []
-                if "amigos" not in solicitante:
-                    solicitante["amigos"] = []
-                
-                if solicitante_id not in user["amigos"]:
-                    user["amigos"].append(solicitante_id)
-                if user["id"] not in solicitante["amigos"]:
-                    solicitante["amigos"].append(user["id"])
-                
-                # Remove a notificação
-                user["notificacoes"].remove(solicitante_id)
-                save_users(users)
-                st.success(f"Você e {solicitante['username']} agora são amigos!")
+            if st.button(f"Aceitar {nome}", key=f"aceitar_{solicitante_id}"):
+                amigos.aceitar_pedidos(user["id"], [solicitante_id])
+                st.success(f"Você e {nome} agora são amigos!")
                 st.rerun()
         
         with col2:
-            if st.button(f"Recusar {solicitante['username']}", key=f"recusar_{solicitante_id}"):
-                user["notificacoes"].remove(solicitante_id)
-                save_users(users)
-                st.info(f"Pedido de {solicitante['username']} recusado.")
+            if st.button(f"Recusar {nome}", key=f"recusar_{solicitante_id}"):
+                amigos.recusar_pedidos(user["id"], [solicitante_id])
+                st.info(f"Pedido de {nome} recusado.")
                 st.rerun()
 
+def show_mensagens(user):
+    import amigos
+    import mensagens
+
+    st.subheader("Mensagens")
+    grafo = amigos.grafo()
+    ids = grafo.amigos(user["id"])
+    if not ids:
+        st.info("Adicione amigos para começar uma conversa.")
+        return
+    nomes = grafo.nomes(ids)
+    nomes[user["id"]] = user["username"]
+    amigo_id = st.selectbox("Conversar com:", ids, format_func=lambda i: nomes.get(i, i))
+
+    # O cursor é a posição da mensagem mais antiga exibida nesta conversa
+    total = mensagens.total(user["id"], amigo_id)
+    cursores = st.session_state.setdefault("cursores_mensagens", {})
+    inicio = cursores.get(amigo_id, max(0, total - mensagens.MENSAGENS_POR_PAGINA))
+    if inicio > 0 and st.button("Carregar mensagens anteriores"):
+        inicio = max(0, inicio - mensagens.MENSAGENS_POR_PAGINA)
+        cursores[amigo_id] = inicio
+
+    historico, _ = mensagens.historico(user["id"], amigo_id, limite=total - inicio)
+    for mensagem in historico:
+        st.markdown(f"**{nomes.get(mensagem['sender'], mensagem['sender'])}:** {mensagem['text']}")
+
+    texto = st.text_input("Mensagem", key=f"mensagem_{amigo_id}")
+    if st.button("Enviar") and texto:
+        mensagens.enviar(user["id"], amigo_id, texto)
+        if amigo_id in cursores:
+            # Mantém a mesma janela e inclui a mensagem nova
+            cursores[amigo_id] = min(cursores[amigo_id], total + 1 - mensagens.MENSAGENS_POR_PAGINA)
+        st.rerun()
+
 def show_perfil(user):
     st.title(f"Perfil: {user['username']}")
     st.subheader(f"ID: {user['id']}")
@@ -394,18 +337,26 @@ def show_perfil(user):
     # Anotações
     anotacao = st.text_area("Anotação pessoal:", value=user.get("anotacao", ""))
     if st.button("Salvar anotação"):
-        users = load_users()
-        users[user["id"]]["anotacao"] = anotacao
-        save_users(users)
+        with update_users([user["id"]]) as records:
+            records[user["id"]]["anotacao"] = anotacao
         st.success("Anotação salva!")
 
     # Amigos
+    import amigos
+
     st.subheader("Amigos:")
-    if "amigos" in user and user["amigos"]:
-        users = load_users()
-        for amigo_id in user["amigos"]:
-            if amigo_id in users:
-                st.write(f"- {users[amigo_id]['username']}")
+    grafo = amigos.grafo()
+    total = grafo.total(user["id"])
+    if total:
+        paginas = -(-total // amigos.AMIGOS_POR_PAGINA)
+        pagina = 1
+        if paginas > 1:
+            pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1)
+        ids = grafo.pagina(user["id"], pagina)
+        nomes = grafo.nomes(ids)
+        for amigo_id in ids:
+            if amigo_id in nomes:
+                st.write(f"- {nomes[amigo_id]}")
             else:
                 st.write(f"- Usuário desconhecido (ID: {amigo_id})")
     else:
@@ -415,29 +366,62 @@ def show_perfil(user):
     st.subheader("Buscar usuário por ID")
     search_id = st.text_input("ID do usuário")
     if st.button("Enviar pedido de amizade"):
-        users = load_users()
-        
         if not search_id:
             st.error("Por favor, insira um ID válido")
         elif search_id == user["id"]:
             st.error("Você não pode adicionar a si mesmo como amigo")
-        elif search_id not in users:
+        elif load_user(search_id) is None:
             st.error("ID de usuário não encontrado")
         else:
-            target_user = users[search_id]
-            
-            # Inicializa notificações se não existirem
-            if "notificacoes" not in target_user:
-                target_user["notificacoes"] = []
-            
-            # Verifica se já existe um pedido pendente
-            if user["id"] in target_user["notificacoes"]:
-                st.warning("Você já enviou um pedido para este usuário")
-            else:
-                target_user["notificacoes"].append(user["id"])
-                save_users(users)
+            import notificacoes
+
+            # O pedido vai para a fila de notificações, sem regravar o usuário;
+            # pedidos repetidos são descartados pela própria fila
+            if notificacoes.enviar_pedido(user["id"], search_id):
                 st.success("Pedido de amizade enviado com sucesso!")
+            else:
+                st.warning("Você já enviou um pedido para este usuário")
+
 
+def show_metricas():
+    st.subheader("Métricas do servidor")
+    st.caption(f"Arquivo Prometheus: {metricas.ARQUIVO} (gravado a cada {metricas.INTERVALO:g} s)")
+
+    latencias, contadores = metricas.resumo()
+    st.write("**Latências e espera por locks**")
+    if latencias:
+        st.dataframe(latencias, use_container_width=True)
+    else:
+        st.info("Nenhuma medição ainda.")
+    st.write("**Bytes de E/S**")
+    if contadores:
+        st.dataframe(contadores, use_container_width=True)
+    else:
+        st.info("Nenhuma leitura ou escrita registrada.")
+
+    import formulas
+    import storage
+
+    st.write("**Caches**")
+    st.json({"usuarios": storage.cache_stats(), "formulas": formulas.cache_stats()})
+
+    st.write("**Perfis (cProfile)**")
+    perfis = metricas.perfis()
+    if not perfis:
+        st.info(f"Nenhum perfil coletado. Amostragem atual: {metricas.PERFIL_AMOSTRA:g} "
+                "(ajuste com CALC_PERFIL_AMOSTRA).")
+    for perfil in perfis:
+        with st.expander(f"{perfil['nome']} — {perfil['duracao'] * 1000:.1f} ms"):
+            st.code(perfil["relatorio"])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Baixar métricas (Prometheus)", metricas.prometheus(),
+                           file_name="metricas.prom", mime="text/plain")
+    with col2:
+        if st.button("Zerar métricas"):
+            metricas.zerar()
+            st.rerun()
 
 
 # ---------------- Execução Principal ---------------- #
@@ -448,21 +432,34 @@ def main():
         st.session_state.logged_user = None
 
     if st.session_state.logged_user:
-        opcao = st.sidebar.selectbox("Escolha a opção", ["Perfil", "Notificações", "Cálculos", "Sair"])
-        if opcao == "Perfil":
-            show_perfil(st.session_state.logged_user)
-        elif opcao == "Notificações":
-            show_notificacoes(st.session_state.logged_user)
-        elif opcao == "Cálculos":
-            aba_calculos()
-        elif opcao == "Sair":
-            logout()
+        opcoes = ["Perfil", "Notificações", "Mensagens", "Cálculos", "Sair"]
+        if metricas.eh_admin(st.session_state.logged_user):
+            opcoes.insert(-1, "Métricas")
+        opcao = st.sidebar.selectbox("Escolha a opção", opcoes)
     else:
-        escolha = st.sidebar.radio("Login ou Registro", ["Login", "Registrar"], key="login_registro_radio")
-        if escolha == "Login":
-            login()
-        else:
-            register()
+        opcao = st.sidebar.radio("Login ou Registro", ["Login", "Registrar"], key="login_registro_radio")
+
+    # Cada renderização de página entra no histograma e, por amostragem, no cProfile
+    try:
+        with metricas.medir(f"pagina.{opcao}"), metricas.perfilar(f"pagina.{opcao}"):
+            if opcao == "Perfil":
+                show_perfil(st.session_state.logged_user)
+            elif opcao == "Notificações":
+                show_notificacoes(st.session_state.logged_user)
+            elif opcao == "Mensagens":
+                show_mensagens(st.session_state.logged_user)
+            elif opcao == "Cálculos":
+                aba_calculos()
+            elif opcao == "Métricas":
+                show_metricas()
+            elif opcao == "Sair":
+                logout()
+            elif opcao == "Login":
+                login()
+            else:
+                register()
+    finally:
+        metricas.gravar_periodicamente()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,198 @@
+"""Armazenamento das conversas entre usuários.
+
+Cada conversa tem uma chave canônica (os dois participantes em ordem,
+separados por "|") e uma pasta própria com segmentos JSONL de tamanho
+fixo, onde as mensagens só são acrescentadas. Abrir uma conversa lê
+apenas os segmentos da página pedida, não importa quantas mensagens
+existam no total. O index.json guarda as conversas de cada participante
+e só muda quando uma conversa nova é criada.
+
+Para importar o messages.json antigo:
+    python mensagens.py migrar [--origem messages.json]
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import threading
+import time
+
+DIRETORIO = os.environ.get("CALC_MENSAGENS_DIR", "mensagens")
+MENSAGENS_POR_SEGMENTO = 1000
+MENSAGENS_POR_PAGINA = 20
+
+_lock = threading.Lock()
+
+
+def chave(a, b):
+    return "|".join(sorted((str(a), str(b))))
+
+
+def _pasta(chave_conversa):
+    nome = hashlib.sha1(chave_conversa.encode()).hexdigest()
+    return os.path.join(DIRETORIO, nome)
+
+
+def _segmento(pasta, numero):
+    return os.path.join(pasta, f"{numero:06d}.jsonl")
+
+
+def _ler_linhas(caminho):
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return [json.loads(linha) for linha in f if linha.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _contar_linhas(caminho):
+    try:
+        with open(caminho, "rb") as f:
+            return sum(1 for linha in f if linha.strip())
+    except FileNotFoundError:
+        return 0
+
+
+def _total(pasta):
+    # Todos os segmentos anteriores estão cheios; basta contar o último
+    segmentos = sorted(n for n in os.listdir(pasta) if n.endswith(".jsonl"))
+    if not segmentos:
+        return 0
+    ultimo = int(segmentos[-1].split(".")[0])
+    return ultimo * MENSAGENS_POR_SEGMENTO + _contar_linhas(os.path.join(pasta, segmentos[-1]))
+
+
+def _carregar_indice():
+    try:
+        with open(os.path.join(DIRETORIO, "index.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _registrar_conversa(chave_conversa, participantes):
+    # Chamado com _lock adquirido, só na criação da conversa
+    pasta = _pasta(chave_conversa)
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"chave": chave_conversa, "participantes": participantes}, f)
+
+    indice = _carregar_indice()
+    for participante in participantes:
+        conversas = indice.setdefault(participante, [])
+        if chave_conversa not in conversas:
+            conversas.append(chave_conversa)
+    tmp = os.path.join(DIRETORIO, "index.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indice, f)
+    os.replace(tmp, os.path.join(DIRETORIO, "index.json"))
+
+
+def existe(a, b):
+    return os.path.exists(os.path.join(_pasta(chave(a, b)), "meta.json"))
+
+
+def _acrescentar(a, b, mensagens):
+    chave_conversa = chave(a, b)
+    pasta = _pasta(chave_conversa)
+    with _lock:
+        if not os.path.exists(os.path.join(pasta, "meta.json")):
+            _registrar_conversa(chave_conversa, sorted((str(a), str(b))))
+        total = _total(pasta)
+        for mensagem in mensagens:
+            with open(_segmento(pasta, total // MENSAGENS_POR_SEGMENTO), "a", encoding="utf-8") as f:
+                f.write(json.dumps(mensagem, ensure_ascii=False) + "\n")
+            total += 1
+
+
+def enviar(remetente, destinatario, texto):
+    mensagem = {"sender": remetente, "text": texto, "ts": time.time()}
+    _acrescentar(remetente, destinatario, [mensagem])
+    return mensagem
+
+
+def total(a, b):
+    pasta = _pasta(chave(a, b))
+    return _total(pasta) if os.path.isdir(pasta) else 0
+
+
+def historico(a, b, antes=None, limite=MENSAGENS_POR_PAGINA):
+    """Devolve (mensagens, cursor) com até `limite` mensagens anteriores à posição `antes`.
+
+    Sem `antes`, devolve as mais recentes. As mensagens vêm em ordem
+    cronológica; o cursor é a posição da mais antiga devolvida, ou None
+    quando não há nada antes dela.
+    """
+    pasta = _pasta(chave(a, b))
+    if not os.path.isdir(pasta):
+        return [], None
+    fim = _total(pasta) if antes is None else antes
+    inicio = max(0, fim - limite)
+
+    mensagens = []
+    primeiro = inicio // MENSAGENS_POR_SEGMENTO
+    ultimo = (fim - 1) // MENSAGENS_POR_SEGMENTO if fim else -1
+    for numero in range(primeiro, ultimo + 1):
+        base = numero * MENSAGENS_POR_SEGMENTO
+        linhas = _ler_linhas(_segmento(pasta, numero))
+        mensagens.extend(linhas[max(0, inicio - base):fim - base])
+    return mensagens, (inicio or None)
+
+
+def conversas(participante):
+    """Chaves das conversas de um participante."""
+    return list(_carregar_indice().get(str(participante), []))
+
+
+def migrar(origem="messages.json", resolver=None):
+    """Importa o messages.json antigo. Conversas já existentes são ignoradas.
+
+    As chaves antigas são tuplas em texto, como "('us', 'uuu')". `resolver`
+    pode converter cada participante (ex.: username -> id do usuário).
+    """
+    with open(origem, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+
+    importadas = 0
+    for chave_antiga, valor in dados.items():
+        a, b = ast.literal_eval(chave_antiga)
+        if resolver:
+            a, b = resolver(a), resolver(b)
+        if existe(a, b):
+            continue
+        # A entrada "(1, 2)" guarda um único dict {"content": ...}, sem remetente
+        lista = valor if isinstance(valor, list) else [{"sender": None, "text": valor.get("content", "")}]
+        mensagens = []
+        for item in lista:
+            remetente = item.get("sender")
+            if resolver and remetente is not None:
+                remetente = resolver(remetente)
+            mensagens.append({"sender": remetente, "text": item.get("text", ""), "ts": None})
+        _acrescentar(a, b, mensagens)
+        importadas += 1
+    return importadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ferramentas do armazenamento de mensagens")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    migracao = sub.add_parser("migrar", help="importa o messages.json antigo")
+    migracao.add_argument("--origem", default="messages.json")
+    args = parser.parse_args()
+
+    if args.comando == "migrar":
+        import storage
+
+        backend = storage.get_backend()
+
+        def resolver(participante):
+            # Usernames conhecidos passam a apontar para o id do usuário
+            return backend.find_id(str(participante)) or str(participante)
+
+        total = migrar(args.origem, resolver)
+        print(f"{total} conversas importadas de {args.origem} para {DIRETORIO}/")
+
+
+if __name__ == "__main__":
+    main()
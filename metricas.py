@@ -0,0 +1,252 @@
+"""Métricas de desempenho do processo: latências, bytes de E/S e espera por locks.
+
+Tudo fica em memória, compartilhado pelas sessões do Streamlit:
+
+- medir(operacao) / @cronometrado(operacao): histograma de latência;
+- esperar_lock(lock, nome): adquire o lock e registra quanto tempo esperou;
+- contar_io(arquivo, op, n): bytes lidos e gravados por arquivo;
+- perfilar(nome): roda o cProfile numa amostra das execuções
+  (CALC_PERFIL_AMOSTRA, de 0 a 1; padrão 0, desligado).
+
+As métricas aparecem na página "Métricas" só para os usuários cujos ids
+(mostrados no perfil) estão em CALC_ADMINS, separados por vírgula; o
+username não serve, porque qualquer um pode registrar o nome que quiser.
+Elas são gravadas no formato texto do Prometheus em CALC_METRICAS_ARQUIVO
+(padrão metricas.prom), no máximo a cada CALC_METRICAS_INTERVALO
+segundos. CALC_METRICAS=0 desliga tudo.
+"""
+import functools
+import io
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+ATIVO = os.environ.get("CALC_METRICAS", "1") != "0"
+ARQUIVO = os.environ.get("CALC_METRICAS_ARQUIVO", "metricas.prom")
+INTERVALO = float(os.environ.get("CALC_METRICAS_INTERVALO", 15))
+PERFIL_AMOSTRA = float(os.environ.get("CALC_PERFIL_AMOSTRA", 0))
+PERFIS_GUARDADOS = 20
+ADMINS = {user_id.strip() for user_id in os.environ.get("CALC_ADMINS", "").split(",") if user_id.strip()}
+
+# Limites superiores (segundos) das faixas dos histogramas
+FAIXAS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+DURACAO = "calc_duracao_segundos"
+ESPERA_LOCK = "calc_espera_lock_segundos"
+IO_BYTES = "calc_io_bytes_total"
+
+_lock = threading.Lock()
+# (métrica, rótulos) -> [contagem por faixa, soma, máximo]
+_histogramas = {}
+# (métrica, rótulos) -> valor
+_contadores = {}
+_perfis = deque(maxlen=PERFIS_GUARDADOS)
+_perfil_lock = threading.Lock()
+_gravado_em = 0.0
+
+
+def eh_admin(user):
+    return isinstance(user, dict) and user.get("id") in ADMINS
+
+
+def observar(metrica, valor, **rotulos):
+    """Registra `valor` (segundos) no histograma da métrica com esses rótulos."""
+    if not ATIVO:
+        return
+    chave = (metrica, tuple(sorted(rotulos.items())))
+    with _lock:
+        item = _histogramas.get(chave)
+        if item is None:
+            item = _histogramas[chave] = [[0] * len(FAIXAS), 0.0, 0.0]
+        for i, limite in enumerate(FAIXAS):
+            if valor <= limite:
+                item[0][i] += 1
+                break
+        item[1] += valor
+        item[2] = max(item[2], valor)
+
+
+def somar(metrica, valor, **rotulos):
+    if not ATIVO:
+        return
+    chave = (metrica, tuple(sorted(rotulos.items())))
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+@contextmanager
+def medir(operacao):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(DURACAO, time.perf_counter() - inicio, operacao=operacao)
+
+
+def cronometrado(operacao):
+    """Decorador: mede cada chamada da função como `operacao`."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            with medir(operacao):
+                return funcao(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+
+@contextmanager
+def esperar_lock(lock, nome):
+    """Adquire `lock` registrando o tempo de espera com o rótulo `nome`."""
+    inicio = time.perf_counter()
+    lock.acquire()
+    observar(ESPERA_LOCK, time.perf_counter() - inicio, lock=nome)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def contar_io(arquivo, op, n):
+    """Soma `n` bytes lidos (op="leitura") ou gravados (op="escrita") no arquivo."""
+    somar(IO_BYTES, n, arquivo=os.path.basename(arquivo), op=op)
+
+
+@contextmanager
+def perfilar(nome):
+    """Roda o cProfile numa amostra das execuções do bloco.
+
+    Só um perfil por vez no processo: as execuções que caírem na amostra
+    enquanto outra está sendo perfilada rodam normalmente.
+    """
+    if not ATIVO or PERFIL_AMOSTRA <= 0 or random.random() >= PERFIL_AMOSTRA:
+        yield
+        return
+    if not _perfil_lock.acquire(blocking=False):
+        yield
+        return
+    import cProfile
+    import pstats
+
+    perfil = cProfile.Profile()
+    inicio = time.perf_counter()
+    try:
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+        texto = io.StringIO()
+        pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(30)
+        _perfis.append({
+            "nome": nome,
+            "quando": time.time(),
+            "duracao": time.perf_counter() - inicio,
+            "relatorio": texto.getvalue(),
+        })
+    finally:
+        _perfil_lock.release()
+
+
+def _quantil(contagens, total, q):
+    # Estimativa pelo limite superior da faixa onde o quantil cai
+    alvo = q * total
+    acumulado = 0
+    for limite, contagem in zip(FAIXAS, contagens):
+        acumulado += contagem
+        if acumulado >= alvo:
+            return limite
+    return FAIXAS[-1]
+
+
+def resumo():
+    """Histogramas e contadores em listas de dicts, para exibir numa tabela."""
+    with _lock:
+        histogramas = [(k, [list(v[0]), v[1], v[2]]) for k, v in _histogramas.items()]
+        contadores = list(_contadores.items())
+    linhas = []
+    for (metrica, rotulos), (contagens, soma, maximo) in sorted(histogramas):
+        total = sum(contagens)
+        linhas.append({
+            "métrica": metrica,
+            **dict(rotulos),
+            "chamadas": total,
+            "média (ms)": soma / total * 1000 if total else 0.0,
+            "p50 (ms) ≤": _quantil(contagens, total, 0.5) * 1000,
+            "p95 (ms) ≤": _quantil(contagens, total, 0.95) * 1000,
+            "p99 (ms) ≤": _quantil(contagens, total, 0.99) * 1000,
+            "máx (ms)": maximo * 1000,
+        })
+    contagens = [
+        {"métrica": metrica, **dict(rotulos), "valor": valor}
+        for (metrica, rotulos), valor in sorted(contadores)
+    ]
+    return linhas, contagens
+
+
+def perfis():
+    """Relatórios de cProfile mais recentes, do mais novo para o mais antigo."""
+    return list(reversed(_perfis))
+
+
+def zerar():
+    with _lock:
+        _histogramas.clear()
+        _contadores.clear()
+    _perfis.clear()
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(rotulos, extra=()):
+    itens = list(rotulos) + list(extra)
+    if not itens:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in itens) + "}"
+
+
+def prometheus():
+    """Todas as métricas no formato texto de exposição do Prometheus."""
+    with _lock:
+        histogramas = sorted((k, list(v[0]), v[1]) for k, v in _histogramas.items())
+        contadores = sorted(_contadores.items())
+
+    linhas = []
+    tipos = set()
+    for (metrica, rotulos), contagens, soma in histogramas:
+        if metrica not in tipos:
+            tipos.add(metrica)
+            linhas.append(f"# TYPE {metrica} histogram")
+        acumulado = 0
+        for limite, contagem in zip(FAIXAS, contagens):
+            acumulado += contagem
+            le = "+Inf" if limite == float("inf") else repr(float(limite))
+            linhas.append(f"{metrica}_bucket{_rotulos(rotulos, [('le', le)])} {acumulado}")
+        linhas.append(f"{metrica}_sum{_rotulos(rotulos)} {soma!r}")
+        linhas.append(f"{metrica}_count{_rotulos(rotulos)} {acumulado}")
+    for (metrica, rotulos), valor in contadores:
+        if metrica not in tipos:
+            tipos.add(metrica)
+            linhas.append(f"# TYPE {metrica} counter")
+        linhas.append(f"{metrica}{_rotulos(rotulos)} {valor}")
+    return "\n".join(linhas) + "\n"
+
+
+def gravar(caminho=ARQUIVO):
+    """Grava o texto do Prometheus em `caminho` de forma atômica."""
+    global _gravado_em
+    tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus())
+    os.replace(tmp, caminho)
+    _gravado_em = time.monotonic()
+
+
+def gravar_periodicamente(caminho=ARQUIVO):
+    """Grava o arquivo se já passou INTERVALO desde a última gravação."""
+    if ATIVO and time.monotonic() - _gravado_em >= INTERVALO:
+        gravar(caminho)
@@ -0,0 +1,40 @@
+"""Importa um users.json existente para o backend SQLite.
+
+Uso:
+    python migrate_users.py [--origem users.json] [--destino users.db]
+
+Entradas antigas (hash em string ou dict com "friends" por username) são
+convertidas para o formato atual com id, username, amigos, notificacoes
+e anotacao.
+"""
+import argparse
+import json
+
+from storage import SQLITE_FILE, USERS_FILE, SqliteBackend, normalize_users
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra users.json para SQLite")
+    parser.add_argument("--origem", default=USERS_FILE)
+    parser.add_argument("--destino", default=SQLITE_FILE)
+    args = parser.parse_args()
+
+    with open(args.origem, "r") as f:
+        raw = json.load(f)
+    users = normalize_users(raw)
+
+    backend = SqliteBackend(args.destino)
+    # Permite rodar a migração de novo sem duplicar usernames já importados
+    novos = {
+        user_id: user for user_id, user in users.items()
+        if backend.find_id(user["username"]) in (None, user_id)
+    }
+    backend.put_many(novos)
+    print(f"{len(novos)} usuários importados de {args.origem} para {args.destino}")
+    if len(novos) < len(users):
+        print(f"{len(users) - len(novos)} usernames já existiam no destino e foram ignorados.")
+    print("Defina CALC_STORAGE=sqlite para usar o novo backend.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Fila de notificações por destinatário.
+
+As notificações (hoje, pedidos de amizade) não ficam mais dentro do
+users.json. Cada envio entra numa fila em memória e uma thread de fundo
+acrescenta o evento em notificacoes/fila.jsonl; o índice por
+destinatário em memória é atualizado na hora, então quem lê no mesmo
+processo já vê o resultado. Envios repetidos com o mesmo
+(tipo, remetente, destinatário) são descartados enquanto o anterior não
+vence.
+
+De tempos em tempos o log é compactado: o índice vai para
+notificacoes/index.json (sem as notificações vencidas pelo TTL) e o log
+recomeça vazio. Um lock em notificacoes/fila.lock impede que outro
+processo acrescente eventos ao log durante a compactação.
+
+Para importar o notifications.json antigo e as listas "notificacoes"
+dos usuários:
+    python notificacoes.py migrar [--origem notifications.json]
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+DIRETORIO = os.environ.get("CALC_NOTIFICACOES_DIR", "notificacoes")
+TTL = float(os.environ.get("CALC_NOTIFICACOES_TTL", 30 * 24 * 3600))
+COMPACTAR_APOS = 10000  # eventos no log
+TENTATIVAS_GRAVACAO = 5
+
+log = logging.getLogger(__name__)
+
+PEDIDO_AMIZADE = "friend_request"
+
+
+class FilaNotificacoes:
+    def __init__(self, diretorio=DIRETORIO, ttl=TTL):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.log_path = os.path.join(diretorio, "fila.jsonl")
+        self.index_path = os.path.join(diretorio, "index.json")
+        os.makedirs(diretorio, exist_ok=True)
+        self._lock = threading.RLock()
+        self._trava = open(os.path.join(diretorio, "fila.lock"), "a")
+        self._travado = False
+        # destinatário -> {(tipo, remetente): notificação}
+        self._index = {}
+        self._offset = 0
+        self._eventos = 0
+        self._recarregar = False
+        self._fila = queue.Queue()
+        self._carregar()
+        threading.Thread(target=self._trabalhador, daemon=True).start()
+
+    # ---------------- Estado em memória ---------------- #
+
+    def _aplicar(self, evento):
+        chave = (evento["type"], evento["from"])
+        if evento.get("op", "add") == "add":
+            # Um novo envio (depois de vencido o anterior) renova o ts e vai
+            # para o fim, mantendo a ordem do mais antigo para o mais novo
+            pendentes = self._index.setdefault(evento["to"], {})
+            pendentes.pop(chave, None)
+            pendentes[chave] = {"type": evento["type"], "from": evento["from"], "ts": evento["ts"]}
+        else:
+            pendentes = self._index.get(evento["to"])
+            if pendentes is not None:
+                pendentes.pop(chave, None)
+                if not pendentes:
+                    del self._index[evento["to"]]
+
+    @contextlib.contextmanager
+    def _travar_arquivo(self, exclusivo=False):
+        # Chamado com self._lock adquirido. Quem lê o índice ou acrescenta ao
+        # log pega o lock compartilhado; a compactação pega o exclusivo, para
+        # que nenhum outro processo escreva entre a última leitura e o
+        # truncamento do log
+        if fcntl is None or self._travado:
+            yield
+            return
+        fcntl.flock(self._trava, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        self._travado = True
+        try:
+            yield
+        finally:
+            self._travado = False
+            fcntl.flock(self._trava, fcntl.LOCK_UN)
+
+    def _carregar(self):
+        # Chamado com self._lock adquirido (ou na construção)
+        with self._travar_arquivo():
+            self._index = {}
+            try:
+                with open(self.index_path, "r") as f:
+                    for destinatario, itens in json.load(f).items():
+                        self._index[destinatario] = {(n["type"], n["from"]): n for n in itens}
+            except FileNotFoundError:
+                pass
+            self._offset = 0
+            self._eventos = 0
+            self._ler_log()
+            self._recarregar = False
+
+    def _ler_log(self):
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._offset)
+                for linha in f:
+                    if not linha.endswith(b"\n"):
+                        break  # linha ainda sendo escrita por outro processo
+                    self._offset += len(linha)
+                    try:
+                        evento = json.loads(linha)
+                    except ValueError:
+                        continue  # linha em branco ou resto de uma gravação que falhou
+                    self._aplicar(evento)
+                    self._eventos += 1
+        except FileNotFoundError:
+            pass
+
+    def _sincronizar(self):
+        # Outro processo pode ter escrito ou compactado a fila
+        with self._lock:
+            try:
+                tamanho = os.path.getsize(self.log_path)
+            except FileNotFoundError:
+                tamanho = 0
+            if self._recarregar or tamanho < self._offset:
+                self._carregar()
+            elif tamanho > self._offset:
+                self._ler_log()
+
+    # ---------------- Escrita assíncrona ---------------- #
+
+    def _trabalhador(self):
+        while True:
+            eventos = [self._fila.get()]
+            # Agrupa o que já estiver na fila numa única escrita
+            while len(eventos) < 500:
+                try:
+                    eventos.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._gravar_eventos(eventos)
+            except Exception:
+                # O índice em memória já tem os eventos; só o disco ficou sem eles
+                log.exception("Descartando %d notificações que não puderam ser gravadas", len(eventos))
+            finally:
+                for _ in eventos:
+                    self._fila.task_done()
+            try:
+                with self._lock:
+                    if self._eventos >= COMPACTAR_APOS:
+                        self.compactar()
+            except OSError:
+                log.exception("Falha ao compactar a fila de notificações")
+
+    def _gravar_eventos(self, eventos):
+        dados = b"".join(json.dumps(e).encode() + b"\n" for e in eventos)
+        for tentativa in range(TENTATIVAS_GRAVACAO):
+            try:
+                with self._lock, self._travar_arquivo():
+                    with open(self.log_path, "ab") as f:
+                        # Depois de uma falha pode ter ficado meia linha no fim do log
+                        f.write(dados if tentativa == 0 else b"\n" + dados)
+                        tamanho = f.tell()
+                    if tamanho != self._offset + len(dados):
+                        self._recarregar = True
+                    self._offset = tamanho
+                    self._eventos += len(eventos)
+                return
+            except OSError:
+                if tentativa == TENTATIVAS_GRAVACAO - 1:
+                    raise
+                log.warning("Falha ao gravar notificações; tentando de novo", exc_info=True)
+                time.sleep(0.1 * 2 ** tentativa)
+
+    def _publicar(self, evento):
+        with self._lock:
+            self._aplicar(evento)
+        self._fila.put(evento)
+
+    def esperar(self):
+        """Bloqueia até todos os eventos enfileirados estarem no disco."""
+        self._fila.join()
+
+    def _vencida(self, notificacao, agora):
+        return agora - notificacao["ts"] > self.ttl
+
+    def compactar(self):
+        with self._lock, self._travar_arquivo(exclusivo=True):
+            while True:
+                # Inclui o que outros processos acrescentaram ao log
+                self._sincronizar()
+                agora = time.time()
+                dados = {
+                    destinatario: [n for n in itens.values() if not self._vencida(n, agora)]
+                    for destinatario, itens in self._index.items()
+                }
+                dados = {k: v for k, v in dados.items() if v}
+                tmp = self.index_path + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(dados, f)
+                os.replace(tmp, self.index_path)
+                # Sem fcntl o log pode crescer enquanto o índice é gravado;
+                # nesse caso refaz com os eventos novos
+                try:
+                    if os.path.getsize(self.log_path) == self._offset:
+                        break
+                except FileNotFoundError:
+                    break
+            open(self.log_path, "w").close()
+            self._index = {k: {(n["type"], n["from"]): n for n in v} for k, v in dados.items()}
+            self._offset = 0
+            self._eventos = 0
+
+    # ---------------- API ---------------- #
+
+    def enviar(self, tipo, remetente, destinatario):
+        """Enfileira a notificação. Devolve False se ela já estava pendente."""
+        with self._lock:
+            self._sincronizar()
+            existente = self._index.get(destinatario, {}).get((tipo, remetente))
+            if existente is not None and not self._vencida(existente, time.time()):
+                return False
+            self._publicar({"op": "add", "type": tipo, "from": remetente, "to": destinatario, "ts": time.time()})
+        return True
+
+    def remover(self, destinatario, tipo, remetentes):
+        with self._lock:
+            for remetente in remetentes:
+                self._publicar({"op": "del", "type": tipo, "from": remetente, "to": destinatario, "ts": time.time()})
+
+    def pendentes(self, destinatario, tipo=None):
+        """Notificações pendentes do destinatário, da mais antiga para a mais nova."""
+        agora = time.time()
+        with self._lock:
+            self._sincronizar()
+            itens = list(self._index.get(destinatario, {}).values())
+        return [
+            n for n in itens
+            if not self._vencida(n, agora) and (tipo is None or n["type"] == tipo)
+        ]
+
+
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def fila():
+    global _fila
+    if _fila is None:
+        with _fila_lock:
+            if _fila is None:
+                _fila = FilaNotificacoes()
+    return _fila
+
+
+def enviar_pedido(remetente, destinatario):
+    return fila().enviar(PEDIDO_AMIZADE, remetente, destinatario)
+
+
+def pedidos_pendentes(destinatario):
+    """Ids de quem enviou pedido de amizade ao destinatário."""
+    return [n["from"] for n in fila().pendentes(destinatario, PEDIDO_AMIZADE)]
+
+
+def remover_pedidos(destinatario, remetentes):
+    fila().remover(destinatario, PEDIDO_AMIZADE, remetentes)
+
+
+def importar_legado(user_id):
+    """Move a lista "notificacoes" antiga do registro do usuário para a fila."""
+    import storage
+
+    backend = storage.get_backend()
+    user = backend.get(user_id)
+    if not isinstance(user, dict) or not user.get("notificacoes"):
+        return 0
+    with backend.transaction([user_id]) as records:
+        antigas = records[user_id].get("notificacoes", [])
+        records[user_id]["notificacoes"] = []
+    for remetente in antigas:
+        enviar_pedido(remetente, user_id)
+    return len(antigas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ferramentas da fila de notificações")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    migracao = sub.add_parser("migrar", help="importa notifications.json e as listas dos usuários")
+    migracao.add_argument("--origem", default="notifications.json")
+    sub.add_parser("compactar", help="compacta o log e remove notificações vencidas")
+    args = parser.parse_args()
+
+    if args.comando == "migrar":
+        import storage
+
+        backend = storage.get_backend()
+        total = 0
+        if os.path.exists(args.origem):
+            with open(args.origem, "r") as f:
+                for item in json.load(f):
+                    # O arquivo antigo usa usernames; passa a usar o id quando existe
+                    destinatario = backend.find_id(item["to"]) or item["to"]
+                    remetente = backend.find_id(item["message"]["from"]) or item["message"]["from"]
+                    total += fila().enviar(item["message"]["type"], remetente, destinatario)
+        import registros
+
+        # A tabela é uma foto dos usuários, então dá para gravar enquanto percorre
+        for user in registros.TabelaUsuarios(backend):
+            if user.notificacoes:
+                total += importar_legado(user.id)
+        fila().esperar()
+        print(f"{total} notificações importadas para {DIRETORIO}/")
+    else:
+        fila().compactar()
+        print("Fila compactada.")
+
+
+if __name__ == "__main__":
+    main()
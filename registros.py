@@ -0,0 +1,322 @@
+"""Usuários em colunas, com os campos grandes carregados só quando usados.
+
+backend.load_all() monta um dict completo por usuário, com hash da senha,
+listas de amigos e notificações e a anotação. Para percorrer muitos
+usuários, TabelaUsuarios guarda só o essencial em colunas:
+
+- ids e usernames em listas (uma string por usuário);
+- hashes das senhas como bytes ASCII;
+- amizades em formato CSR (Adjacencia): um array com o fim da lista de
+  cada usuário e outro com os números de linha dos amigos (4 bytes por
+  amizade). O grafo de amizades (amigos.py) usa a mesma estrutura.
+
+Cada Usuario é só uma referência (tabela, linha) com __slots__. A
+anotação e as notificações não ficam na tabela: são lidas do backend no
+primeiro acesso ao campo.
+
+A tabela é uma foto do backend; tabela() devolve uma nova quando o
+arquivo de dados muda.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+
+import storage
+
+# Campos lidos do backend só quando acessados
+CAMPOS_SOB_DEMANDA = ("anotacao", "notificacoes")
+
+# Listas de amigos maiores que isso respondem Adjacencia.contem() por busca
+# binária numa cópia ordenada, em vez de percorrer a lista
+BUSCA_LINEAR_ATE = 64
+
+
+class Usuario:
+    __slots__ = ("_tabela", "_linha", "_extras")
+
+    def __init__(self, tabela, linha):
+        self._tabela = tabela
+        self._linha = linha
+        self._extras = None
+
+    @property
+    def id(self):
+        return self._tabela.ids[self._linha]
+
+    @property
+    def username(self):
+        return self._tabela.usernames[self._linha]
+
+    @property
+    def password(self):
+        return self._tabela.senhas[self._linha].decode("ascii")
+
+    @property
+    def amigos(self):
+        return self._tabela.amigos(self._linha)
+
+    def _extra(self, campo, padrao):
+        if self._extras is None:
+            registro = self._tabela.backend.get(self.id) or {}
+            self._extras = {c: registro.get(c) for c in CAMPOS_SOB_DEMANDA}
+        valor = self._extras.get(campo)
+        return padrao if valor is None else valor
+
+    @property
+    def anotacao(self):
+        return self._extra("anotacao", "")
+
+    @property
+    def notificacoes(self):
+        return self._extra("notificacoes", [])
+
+    # Acesso no estilo dict, como nos registros devolvidos pelo storage
+    def __getitem__(self, campo):
+        if campo not in ("id", "username", "password", "amigos", *CAMPOS_SOB_DEMANDA):
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def get(self, campo, padrao=None):
+        try:
+            return self[campo]
+        except KeyError:
+            return padrao
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "username": self.username,
+            "password": self.password,
+            "amigos": self.amigos,
+            "notificacoes": self.notificacoes,
+            "anotacao": self.anotacao,
+        }
+
+    def __repr__(self):
+        return f"Usuario(id={self.id!r}, username={self.username!r})"
+
+
+class Adjacencia:
+    """Listas de amigos em formato CSR, indexadas pelo id do usuário.
+
+    Cada id recebe uma linha; `_fim[linha]` é onde termina a lista da
+    linha em `_amigos`, que guarda números de linha (4 bytes por amizade).
+    Ids que só aparecem como amigo de alguém também recebem uma linha,
+    mas não contam como presentes.
+
+    Monte com adicionar() e feche com fechar(), que preenche `ids`;
+    depois disso a estrutura não muda e pode ser compartilhada entre
+    threads. A única exceção é o cache das cópias ordenadas usadas por
+    contem(), que só cresce.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.linhas = {}
+        self.total = 0
+        self._presente = bytearray()
+        self._fim = array("q")
+        self._amigos = array("i")
+        # Durante a montagem: listas na ordem de chegada (numa lista comum,
+        # bem mais rápida de estender) e o intervalo de cada linha
+        self._soltos = []
+        self._intervalos = {}
+        self._ultima = -1
+        self._em_ordem = True
+        # linha -> números de linha dos amigos em ordem crescente
+        self._ordenadas = {}
+
+    @classmethod
+    def de_dict(cls, listas):
+        """Monta a partir de um dict user_id -> ids dos amigos."""
+        adjacencia = cls()
+        # Todos os usuários recebem linha antes: assim quase todo amigo já
+        # tem a sua e adicionar() fica no caminho rápido
+        adjacencia.linhas = dict(zip(listas, range(len(listas))))
+        adjacencia._presente = bytearray(len(listas))
+        for user_id, amigos in listas.items():
+            adjacencia.adicionar(user_id, amigos)
+        adjacencia.fechar()
+        return adjacencia
+
+    def adicionar(self, user_id, amigos):
+        """Registra a lista de amigos do usuário. Devolve a linha dele."""
+        # Uma passada só: ids ainda não vistos recebem a próxima linha na
+        # hora, então a ordem do dict `linhas` é a ordem das linhas
+        linhas = self.linhas
+        linha = linhas.setdefault(user_id, len(linhas))
+        soltos = self._soltos
+        inicio = len(soltos)
+        try:
+            soltos.extend(map(linhas.__getitem__, amigos))
+        except KeyError:
+            # Algum amigo ainda sem linha: desfaz e segue um a um
+            del soltos[inicio:]
+            soltos.extend([linhas.setdefault(amigo, len(linhas)) for amigo in amigos])
+        self._intervalos[linha] = (inicio, len(soltos))
+        if linha <= self._ultima:
+            self._em_ordem = False
+        self._ultima = linha
+        novas = len(linhas) - len(self._presente)
+        if novas:
+            self._presente.extend(bytes(novas))
+        if not self._presente[linha]:
+            self._presente[linha] = 1
+            self.total += 1
+        return linha
+
+    def fechar(self):
+        self.ids = list(self.linhas)
+        # A lista da linha i fica entre _fim[i-1] e _fim[i]; se as listas
+        # não chegaram na ordem das linhas, reordena
+        intervalos = self._intervalos
+        soltos = self._soltos
+        if self._em_ordem:
+            fim = 0
+            for linha in range(len(self.ids)):
+                intervalo = intervalos.get(linha)
+                if intervalo is not None:
+                    fim = intervalo[1]
+                self._fim.append(fim)
+            amigos = soltos
+        else:
+            amigos = []
+            for linha in range(len(self.ids)):
+                intervalo = intervalos.get(linha)
+                if intervalo is not None:
+                    amigos.extend(soltos[intervalo[0]:intervalo[1]])
+                self._fim.append(len(amigos))
+        self._amigos = array("i", amigos)
+        self._soltos = self._intervalos = None
+
+    def presente(self, linha):
+        return bool(self._presente[linha])
+
+    def amigos_da_linha(self, linha, inicio=0, quantidade=None):
+        """Ids dos amigos da linha, inclusive os que não existem mais.
+
+        Com `inicio` e `quantidade`, só esse trecho da lista é convertido.
+        """
+        primeiro = (self._fim[linha - 1] if linha else 0) + inicio
+        ultimo = self._fim[linha]
+        if quantidade is not None:
+            ultimo = min(ultimo, primeiro + quantidade)
+        return [self.ids[amigo] for amigo in self._amigos[primeiro:ultimo]]
+
+    def _linha_presente(self, user_id):
+        linha = self.linhas.get(user_id)
+        if linha is None or not self._presente[linha]:
+            return None
+        return linha
+
+    def amigos(self, user_id, inicio=0, quantidade=None):
+        linha = self._linha_presente(user_id)
+        if linha is None:
+            return []
+        return self.amigos_da_linha(linha, inicio, quantidade)
+
+    def grau(self, user_id):
+        """Quantidade de amigos, sem montar a lista."""
+        linha = self._linha_presente(user_id)
+        if linha is None:
+            return 0
+        return self._fim[linha] - (self._fim[linha - 1] if linha else 0)
+
+    def contem(self, user_id, amigo_id):
+        """Se amigo_id está na lista de amigos de user_id."""
+        linha = self._linha_presente(user_id)
+        amigo = self.linhas.get(amigo_id)
+        if linha is None or amigo is None:
+            return False
+        inicio = self._fim[linha - 1] if linha else 0
+        fim = self._fim[linha]
+        if fim - inicio <= BUSCA_LINEAR_ATE:
+            return amigo in self._amigos[inicio:fim]
+        ordenada = self._ordenadas.get(linha)
+        if ordenada is None:
+            ordenada = self._ordenadas[linha] = array("i", sorted(self._amigos[inicio:fim]))
+        i = bisect_left(ordenada, amigo)
+        return i < len(ordenada) and ordenada[i] == amigo
+
+    def __iter__(self):
+        """Pares (user_id, amigos) dos usuários presentes."""
+        for linha, presente in enumerate(self._presente):
+            if presente:
+                yield self.ids[linha], self.amigos_da_linha(linha)
+
+
+class TabelaUsuarios:
+    def __init__(self, backend):
+        self.backend = backend
+        self.versao = backend.version()
+        self.adjacencia = Adjacencia()
+        # As linhas são as da adjacência; linhas criadas só por aparecerem
+        # como amigo de alguém ficam com username None
+        self.usernames = []
+        self.senhas = []
+        self._por_nome = {}
+        self._carregar()
+        self.ids = self.adjacencia.ids
+
+    def _carregar(self):
+        adjacencia = self.adjacencia
+        for user_id, user in self.backend.iter_all():
+            if not isinstance(user, dict):
+                continue
+            linha = adjacencia.adicionar(user_id, user.get("amigos", ()))
+            novas = len(adjacencia.linhas) - len(self.usernames)
+            if novas:
+                self.usernames.extend([None] * novas)
+                self.senhas.extend([b""] * novas)
+            username = user.get("username", user_id)
+            self.usernames[linha] = username
+            self.senhas[linha] = user.get("password", "").encode("ascii")
+            self._por_nome[username] = linha
+        adjacencia.fechar()
+        novas = len(adjacencia.ids) - len(self.usernames)
+        self.usernames.extend([None] * novas)
+        self.senhas.extend([b""] * novas)
+
+    def __len__(self):
+        return self.adjacencia.total
+
+    def __contains__(self, user_id):
+        linha = self.adjacencia.linhas.get(user_id)
+        return linha is not None and self.adjacencia.presente(linha)
+
+    def __iter__(self):
+        for linha in range(len(self.ids)):
+            if self.adjacencia.presente(linha):
+                yield Usuario(self, linha)
+
+    def usuario(self, user_id):
+        linha = self.adjacencia.linhas.get(user_id)
+        if linha is None or not self.adjacencia.presente(linha):
+            return None
+        return Usuario(self, linha)
+
+    def por_username(self, username):
+        linha = self._por_nome.get(username)
+        return None if linha is None else Usuario(self, linha)
+
+    def amigos(self, linha):
+        """Ids dos amigos da linha, inclusive os que não existem mais."""
+        return self.adjacencia.amigos_da_linha(linha)
+
+
+_tabela = None
+_tabela_lock = threading.Lock()
+
+
+def tabela(backend=None):
+    """Tabela de usuários do backend (o atual, por padrão), recarregada quando os dados mudam.
+
+    Só a tabela mais recente fica guardada; ela é compartilhada por quem
+    pede o mesmo backend e não deve ser alterada.
+    """
+    global _tabela
+    backend = backend or storage.get_backend()
+    with _tabela_lock:
+        if _tabela is None or _tabela.backend is not backend or _tabela.versao != backend.version():
+            _tabela = TabelaUsuarios(backend)
+        return _tabela
@@ -0,0 +1,552 @@
+"""Camada de armazenamento dos usuários.
+
+Dois backends com a mesma interface:
+
+- JsonBackend: o formato original (users.json + username_index.json).
+  Cada escrita ainda reescreve o arquivo inteiro, mas de forma atômica;
+  as leituras usam uma cópia em memória, relida quando o arquivo muda.
+  O username_index.json guarda a versão do users.json de que veio: se
+  ela confere, find_id() não precisa ler os usuários.
+- SqliteBackend: SQLite embutido; cada escrita atualiza apenas os
+  registros alterados, dentro de uma transação.
+
+O backend é escolhido pela variável de ambiente CALC_STORAGE
+("json", padrão, ou "sqlite"). Use migrate_users.py para importar um
+users.json existente para o SQLite.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import metricas
+
+USERS_FILE = "users.json"
+USERNAME_INDEX_FILE = "username_index.json"
+SQLITE_FILE = "users.db"
+
+# Quantidade de locks usados para serializar escritas por registro
+LOCK_STRIPES = 64
+
+# Limite de memória do cache de registros (bytes de JSON serializado)
+CACHE_MAX_BYTES = int(os.environ.get("CALC_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+class UsernameExistsError(Exception):
+    pass
+
+
+def build_username_index(users):
+    # Mapeia username -> id; entradas antigas (apenas hash em string) não têm username
+    index = {}
+    for user_id, user in users.items():
+        if isinstance(user, dict) and "username" in user:
+            index[user["username"]] = user_id
+    return index
+
+
+_listeners = []
+
+
+def add_write_listener(listener):
+    """Registra listener(records, antes, depois), chamado após cada escrita.
+
+    records é None quando a escrita substituiu todos os usuários
+    (save_all); antes e depois são as versões do backend em volta da
+    escrita, para quem mantém índices derivados saber se perdeu alguma.
+    """
+    _listeners.append(listener)
+
+
+def _notify(records, antes, depois):
+    for listener in list(_listeners):
+        listener(records, antes, depois)
+
+
+def _write_json_atomic(path, data, indent=None):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    texto = json.dumps(data, indent=indent)
+    with open(tmp, "w") as f:
+        f.write(texto)
+    os.replace(tmp, path)
+    metricas.contar_io(path, "escrita", len(texto))
+
+
+class JsonBackend:
+    def __init__(self, path=USERS_FILE, index_path=USERNAME_INDEX_FILE):
+        self.path = path
+        self.index_path = index_path
+        # O arquivo é reescrito por inteiro, então um único lock protege tudo
+        self._lock = threading.RLock()
+        # Cópias em memória do arquivo e do índice, relidas só quando
+        # version() muda; o índice tem a sua própria versão porque pode vir
+        # do username_index.json sem que users.json seja lido
+        self._memoria_lock = threading.Lock()
+        self._users = {}
+        self._versao = None
+        self._index = {}
+        self._index_versao = None
+        with self._lock:
+            if not os.path.exists(self.path):
+                _write_json_atomic(self.path, {}, indent=4)
+            with self._memoria_lock:
+                versao = self.version()
+                if self._ler_indice(versao) is None:
+                    # Índice ausente, antigo ou de outra versão do arquivo: refaz
+                    self._em_memoria()
+                    self._gravar_indice(self._index, versao)
+
+    def version(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def load_all(self):
+        with open(self.path, "r") as f:
+            texto = f.read()
+        metricas.contar_io(self.path, "leitura", len(texto))
+        return json.loads(texto)
+
+    def _em_memoria(self):
+        # Chamado com self._memoria_lock adquirido. A versão é lida antes do
+        # arquivo: se ele mudar no meio, a próxima chamada relê de novo.
+        versao = self.version()
+        if versao != self._versao:
+            self._users = self.load_all()
+            self._versao = versao
+            self._index = build_username_index(self._users)
+            self._index_versao = versao
+        return self._users
+
+    def _ler_indice(self, versao):
+        """Carrega o username_index.json se ele corresponde a `versao` do users.json."""
+        try:
+            with open(self.index_path, "r") as f:
+                texto = f.read()
+            metricas.contar_io(self.index_path, "leitura", len(texto))
+            dados = json.loads(texto)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not isinstance(dados, dict) or dados.get("versao") != list(versao):
+            return None
+        self._index = dados["usuarios"]
+        self._index_versao = versao
+        return self._index
+
+    def _indice(self):
+        # Chamado com self._memoria_lock adquirido. Sem precisar dos
+        # registros, confia no arquivo de índice se ele é da versão atual.
+        versao = self.version()
+        if versao != self._index_versao and self._ler_indice(versao) is None:
+            self._em_memoria()
+        return self._index
+
+    def _gravar_indice(self, index, versao):
+        _write_json_atomic(self.index_path, {"versao": list(versao), "usuarios": index})
+
+    def iter_all(self):
+        # O arquivo JSON só pode ser lido inteiro
+        return iter(self.load_all().items())
+
+    def save_all(self, users):
+        with metricas.esperar_lock(self._lock, "users.json"):
+            antes = self.version()
+            depois = self._write(users, build_username_index(users))
+            with self._memoria_lock:
+                self._versao = self._index_versao = None
+            _notify(None, antes, depois)
+
+    def _write(self, users, index):
+        """Grava os usuários e o índice com a versão resultante. Devolve a versão."""
+        _write_json_atomic(self.path, users, indent=4)
+        versao = self.version()
+        self._gravar_indice(index, versao)
+        return versao
+
+    def get(self, user_id):
+        with self._memoria_lock:
+            # Cópia: quem chama pode alterar o registro à vontade
+            return copy.deepcopy(self._em_memoria().get(user_id))
+
+    def get_many(self, user_ids):
+        with self._memoria_lock:
+            users = self._em_memoria()
+            return {user_id: copy.deepcopy(users[user_id]) for user_id in user_ids if user_id in users}
+
+    def find_id(self, username):
+        with self._memoria_lock:
+            return self._indice().get(username)
+
+    def put_many(self, records):
+        with self.transaction(records.keys()) as current:
+            current.update(records)
+
+    @contextmanager
+    def transaction(self, user_ids):
+        user_ids = list(user_ids)
+        with metricas.esperar_lock(self._lock, "users.json"):
+            with self._memoria_lock:
+                users = dict(self._em_memoria())
+                index = self._index
+            records = {user_id: copy.deepcopy(users[user_id]) for user_id in user_ids if user_id in users}
+            yield records
+            for user_id, user in records.items():
+                if isinstance(user, dict) and index.get(user.get("username"), user_id) != user_id:
+                    raise UsernameExistsError(user["username"])
+            antes = self.version()
+            users.update((user_id, copy.deepcopy(user)) for user_id, user in records.items())
+            novo_index = build_username_index(users)
+            depois = self._write(users, novo_index)
+            with self._memoria_lock:
+                # Só adota a cópia nova se ninguém releu o arquivo no meio
+                if self._versao == antes:
+                    self._users = users
+                    self._versao = depois
+                    self._index = novo_index
+                    self._index_versao = depois
+                else:
+                    self._versao = self._index_versao = None
+            _notify(records, antes, depois)
+
+
+class SqliteBackend:
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "id TEXT PRIMARY KEY, username TEXT, data TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS users_username "
+                "ON users(username) WHERE username IS NOT NULL"
+            )
+
+    def _conn(self):
+        # Cada thread do Streamlit (uma por sessão) usa sua própria conexão
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self):
+        # Com WAL as escritas vão primeiro para o arquivo -wal
+        stamps = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def load_all(self):
+        rows = self._conn().execute("SELECT id, data FROM users").fetchall()
+        metricas.contar_io(self.path, "leitura", sum(len(data) for _, data in rows))
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def iter_all(self):
+        """Percorre (id, registro) um de cada vez, sem montar o dict com todos."""
+        total = 0
+        for user_id, data in self._conn().execute("SELECT id, data FROM users"):
+            total += len(data)
+            yield user_id, json.loads(data)
+        metricas.contar_io(self.path, "leitura", total)
+
+    def _begin(self, conn):
+        # BEGIN IMMEDIATE espera o lock de escrita do arquivo (outros processos)
+        inicio = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        metricas.observar(metricas.ESPERA_LOCK, time.perf_counter() - inicio, lock=os.path.basename(self.path))
+
+    def save_all(self, users):
+        conn = self._conn()
+        self._begin(conn)
+        try:
+            antes = self.version()
+            conn.execute("DELETE FROM users")
+            self._upsert(conn, users)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        _notify(None, antes, self.version())
+
+    def get(self, user_id):
+        row = self._conn().execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        metricas.contar_io(self.path, "leitura", len(row[0]))
+        return json.loads(row[0])
+
+    def get_many(self, user_ids):
+        user_ids = list(user_ids)
+        records = {}
+        # Limite de parâmetros por consulta do SQLite
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self._conn().execute(f"SELECT id, data FROM users WHERE id IN ({marks})", chunk).fetchall()
+            metricas.contar_io(self.path, "leitura", sum(len(data) for _, data in rows))
+            records.update((user_id, json.loads(data)) for user_id, data in rows)
+        return records
+
+    def find_id(self, username):
+        row = self._conn().execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, records):
+        with self.transaction(records.keys()) as current:
+            current.update(records)
+
+    @contextmanager
+    def transaction(self, user_ids):
+        # Locks por registro (em faixas) dentro do processo; entre processos o
+        # BEGIN IMMEDIATE do SQLite garante que a leitura e a escrita são atômicas
+        user_ids = list(user_ids)
+        stripes = sorted({hash(user_id) % LOCK_STRIPES for user_id in user_ids})
+        inicio = time.perf_counter()
+        for stripe in stripes:
+            self._locks[stripe].acquire()
+        metricas.observar(metricas.ESPERA_LOCK, time.perf_counter() - inicio, lock="faixas")
+        try:
+            conn = self._conn()
+            self._begin(conn)
+            try:
+                records = self.get_many(user_ids)
+                yield records
+                antes = self.version()
+                self._upsert(conn, records)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            _notify(records, antes, self.version())
+        finally:
+            for stripe in reversed(stripes):
+                self._locks[stripe].release()
+
+    def _upsert(self, conn, records):
+        rows = [
+            (user_id, user.get("username") if isinstance(user, dict) else None, json.dumps(user))
+            for user_id, user in records.items()
+        ]
+        metricas.contar_io(self.path, "escrita", sum(len(row[2]) for row in rows))
+        try:
+            conn.executemany(
+                "INSERT INTO users (id, username, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET username = excluded.username, data = excluded.data",
+                rows,
+            )
+        except sqlite3.IntegrityError as e:
+            raise UsernameExistsError(str(e)) from e
+
+
+class CachedBackend:
+    """Cache LRU de registros em memória, compartilhado por todas as sessões.
+
+    O cache é descartado sempre que o arquivo do backend muda por fora
+    (outro processo). As escritas feitas por aqui atualizam o cache
+    diretamente. Os registros ficam guardados como JSON para que cada
+    leitura devolva uma cópia independente.
+    """
+
+    def __init__(self, backend, max_bytes=CACHE_MAX_BYTES):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._usernames = {}
+        self._bytes = 0
+        self._version = None
+        # Muda a cada escrita ou descarte; leituras feitas fora do lock só
+        # entram no cache se nada mudou desde que começaram
+        self._geracao = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_version(self):
+        # Chamado com self._lock adquirido
+        version = self.backend.version()
+        if version != self._version:
+            self._records.clear()
+            self._usernames.clear()
+            self._bytes = 0
+            self._version = version
+            self._geracao += 1
+
+    def _store(self, user_id, user):
+        data = json.dumps(user)
+        old = self._records.pop(user_id, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._records[user_id] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes and self._records:
+            _, evicted = self._records.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "records": len(self._records),
+                "bytes": self._bytes,
+            }
+
+    def version(self):
+        return self.backend.version()
+
+    def load_all(self):
+        # Usado apenas por ferramentas; as páginas leem registro a registro
+        return self.backend.load_all()
+
+    def iter_all(self):
+        return self.backend.iter_all()
+
+    def save_all(self, users):
+        with self._lock:
+            self.backend.save_all(users)
+            self._records.clear()
+            self._usernames.clear()
+            self._bytes = 0
+            self._version = self.backend.version()
+            self._geracao += 1
+
+    def get(self, user_id):
+        return self.get_many([user_id]).get(user_id)
+
+    def get_many(self, user_ids):
+        found = {}
+        missing = []
+        with self._lock:
+            self._check_version()
+            for user_id in user_ids:
+                data = self._records.get(user_id)
+                if data is None:
+                    missing.append(user_id)
+                else:
+                    self._records.move_to_end(user_id)
+                    found[user_id] = json.loads(data)
+            self.hits += len(found)
+            self.misses += len(missing)
+            geracao = self._geracao
+        if missing:
+            loaded = self.backend.get_many(missing)
+            with self._lock:
+                # Uma escrita no meio pode ter gravado versões mais novas
+                if self._geracao == geracao:
+                    for user_id, user in loaded.items():
+                        self._store(user_id, user)
+            found.update(loaded)
+        return found
+
+    def find_id(self, username):
+        with self._lock:
+            self._check_version()
+            if username in self._usernames:
+                self.hits += 1
+                return self._usernames[username]
+            self.misses += 1
+            geracao = self._geracao
+        user_id = self.backend.find_id(username)
+        with self._lock:
+            if self._geracao == geracao:
+                self._usernames[username] = user_id
+        return user_id
+
+    def put_many(self, records):
+        with self.transaction(records.keys()) as current:
+            current.update(records)
+
+    @contextmanager
+    def transaction(self, user_ids):
+        with self.backend.transaction(user_ids) as records:
+            # Nomes de antes da escrita, para esquecer os que forem trocados
+            nomes_antigos = {
+                user_id: user.get("username")
+                for user_id, user in records.items()
+                if isinstance(user, dict)
+            }
+            yield records
+            with self._lock:
+                # Se o arquivo mudou por fora, o cache não vale mais
+                self._check_version()
+        with self._lock:
+            self._version = self.backend.version()
+            self._geracao += 1
+            for user_id, user in records.items():
+                self._store(user_id, user)
+                novo = user.get("username") if isinstance(user, dict) else None
+                antigo = nomes_antigos.get(user_id)
+                if antigo is not None and antigo != novo and self._usernames.get(antigo) == user_id:
+                    self._usernames[antigo] = None
+                if novo is not None:
+                    self._usernames[novo] = user_id
+
+
+def normalize_users(raw):
+    """Converte o users.json misto (hash em string ou dict sem id) em registros completos."""
+    users = {}
+    ids_by_name = {}
+    for key, value in raw.items():
+        if isinstance(value, dict) and "id" in value:
+            user = dict(value)
+        else:
+            # Entradas antigas são indexadas pelo username
+            legacy = value if isinstance(value, dict) else {"password": value}
+            user = {"id": str(uuid.uuid4()), "username": key, "password": legacy.get("password", "")}
+            user["amigos"] = list(legacy.get("friends", []))
+        user.setdefault("username", key)
+        user.setdefault("amigos", [])
+        user.setdefault("notificacoes", [])
+        user.setdefault("anotacao", "")
+        users[user["id"]] = user
+        ids_by_name[user["username"]] = user["id"]
+
+    # Amigos antigos eram referenciados por username; passa a usar o id
+    for user in users.values():
+        user["amigos"] = [
+            amigo if amigo in users else ids_by_name[amigo]
+            for amigo in user["amigos"]
+            if amigo in users or amigo in ids_by_name
+        ]
+    return users
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if os.environ.get("CALC_STORAGE", "json") == "sqlite":
+                    backend = SqliteBackend(os.environ.get("CALC_SQLITE_FILE", SQLITE_FILE))
+                else:
+                    backend = JsonBackend()
+                if os.environ.get("CALC_CACHE", "1") != "0":
+                    backend = CachedBackend(backend)
+                _backend = backend
+    return _backend
+
+
+def cache_stats():
+    backend = get_backend()
+    return backend.stats() if isinstance(backend, CachedBackend) else None
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do app ficam na raiz do repositório, sem pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def pasta(tmp_path, monkeypatch):
+    """Roda o teste numa pasta vazia: os arquivos de dados usam caminhos relativos."""
+    import storage
+
+    monkeypatch.chdir(tmp_path)
+    # Os listeners de escrita são globais; cada teste começa sem nenhum
+    monkeypatch.setattr(storage, "_listeners", [])
+    return tmp_path
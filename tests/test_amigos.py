@@ -0,0 +1,74 @@
+import json
+import time
+
+import amigos
+import storage
+
+
+def _usuario(user_id, username):
+    return {"id": user_id, "username": username, "password": "x", "amigos": [], "notificacoes": [], "anotacao": ""}
+
+
+def _aceitar(backend, a, b):
+    with backend.transaction([a, b]) as records:
+        records[a]["amigos"].append(b)
+        records[b]["amigos"].append(a)
+
+
+def _indice():
+    with open(amigos.INDEX_FILE) as f:
+        return json.load(f)
+
+
+def _grafo(monkeypatch, intervalo):
+    monkeypatch.setattr(amigos, "INTERVALO_GRAVACAO", intervalo)
+    backend = storage.JsonBackend()
+    backend.save_all({"a": _usuario("a", "ana"), "b": _usuario("b", "bia")})
+    grafo = amigos.FriendGraph(backend)
+    assert grafo.amigos("a") == []
+    return backend, grafo
+
+
+def test_indice_pendente_e_gravado_no_fim_do_intervalo(pasta, monkeypatch):
+    backend, grafo = _grafo(monkeypatch, 0.2)
+    _aceitar(backend, "a", "b")
+    assert _indice()["adjacencia"]["a"] == []
+
+    time.sleep(0.5)
+    dados = _indice()
+    assert dados["versao"] == amigos._versao(backend.version())
+    assert dados["adjacencia"]["a"] == ["b"]
+
+
+def test_gravar_pendente_salva_antes_de_sair(pasta, monkeypatch):
+    backend, grafo = _grafo(monkeypatch, 3600)
+    _aceitar(backend, "a", "b")
+    grafo.gravar_pendente()
+
+    # Um grafo novo (próxima partida) usa o índice sem varrer os usuários
+    monkeypatch.setattr(backend, "iter_all", lambda: iter(()))
+    assert amigos.FriendGraph(backend).amigos("b") == ["a"]
+
+
+def test_escrita_durante_a_gravacao_nao_se_perde(pasta, monkeypatch):
+    backend, grafo = _grafo(monkeypatch, 3600)
+    backend.save_all({**backend.load_all(), "c": _usuario("c", "caio")})
+    assert grafo.amigos("c") == []
+    _aceitar(backend, "a", "b")
+
+    escrever = grafo._escrever
+
+    def escrever_e_aceitar(adjacencia, versao):
+        # Outra sessão grava enquanto o índice é escrito, sem o lock do grafo
+        _aceitar(backend, "a", "c")
+        escrever(adjacencia, versao)
+
+    monkeypatch.setattr(grafo, "_escrever", escrever_e_aceitar)
+    grafo.gravar_pendente()
+    assert grafo.amigos("a") == ["b", "c"] and grafo.sao_amigos("c", "a")
+    assert _indice()["adjacencia"]["a"] == ["b"]
+
+    monkeypatch.setattr(grafo, "_escrever", escrever)
+    grafo.gravar_pendente()
+    assert _indice()["adjacencia"]["a"] == ["b", "c"]
+    assert grafo.amigos("a") == ["b", "c"] and grafo._alterados == {}
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import pytest
+
+import api
+
+BHASKARA = "Fórmula de Bhaskara"
+
+
+def test_formula_que_nao_e_texto():
+    status, resposta = api.responder({"formula": [1], "valores": {}})
+    assert status == 422 and "formula" in resposta["erro"]
+
+
+def test_lote_com_item_invalido_nao_derruba_os_outros():
+    status, resposta = api.responder({
+        "formula": BHASKARA,
+        "lote": [{"a": 1, "b": -3, "c": 2}, {"a": 1, "b": 1e200, "c": 1}, {"a": 1, "b": 10**400, "c": 1}],
+    })
+    assert status == 200
+    assert resposta[0]["resultado"]["x1"] == 2.0
+    assert resposta[1] == {"erro": "Resultado fora do intervalo numérico."}
+    assert resposta[2] == {"erro": "Entrada inválida: b"}
+
+
+def test_resultado_infinito_vira_erro():
+    status, resposta = api.responder({"formula": "Força Resultante", "valores": {"massa": 1e308, "aceleracao": 10}})
+    assert status == 422 and "erro" in resposta
+    json.dumps(resposta, allow_nan=False)
+
+
+@pytest.mark.parametrize("corpo", [b"1" * 5000, b"[" * 100_000 + b"]" * 100_000])
+def test_json_que_o_parser_recusa(corpo):
+    with pytest.raises(api.PedidoInvalido):
+        api._rota("POST", "/calcular", corpo)
+
+
+def test_erro_inesperado_ainda_responde(monkeypatch):
+    def quebrar(corpo):
+        raise RuntimeError("falha")
+
+    monkeypatch.setattr(api, "responder", quebrar)
+
+    async def pedir():
+        servidor = await asyncio.start_server(api._conexao, "127.0.0.1", 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        async with servidor:
+            reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+            writer.write(b"POST /calcular HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}")
+            resposta = await reader.read()
+            writer.close()
+            return resposta
+
+    resposta = asyncio.run(pedir())
+    assert resposta.startswith(b"HTTP/1.1 500") and b"Connection: close" in resposta
+
+
+async def _pedir(porta, corpo):
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    writer.write(b"POST /calcular HTTP/1.1\r\nConnection: close\r\nContent-Length: %d\r\n\r\n%s" % (len(corpo), corpo))
+    resposta = await reader.read()
+    writer.close()
+    cabecalho, corpo = resposta.split(b"\r\n\r\n", 1)
+    return int(cabecalho.split(b" ")[1]), json.loads(corpo)
+
+
+def test_lote_grande_roda_no_pool_sem_travar_o_loop():
+    # Os processos do pool (spawn) usam o MAX_LOTE padrão
+    lote = json.dumps({"formula": BHASKARA, "lote": [{"a": 1, "b": -3, "c": 2}] * api.MAX_LOTE}).encode()
+    grande_demais = json.dumps([{}] * (api.MAX_LOTE + 1)).encode()
+    pequeno = json.dumps({"formula": BHASKARA, "valores": {"a": 1, "b": -3, "c": 2}}).encode()
+
+    async def pedir():
+        servidor = await asyncio.start_server(api._conexao, "127.0.0.1", 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        async with servidor:
+            # Aquece o pool (spawn) antes de medir
+            await _pedir(porta, lote)
+            ordem = []
+
+            async def pedido(nome, corpo):
+                resposta = await _pedir(porta, corpo)
+                ordem.append(nome)
+                return resposta
+
+            respostas = await asyncio.gather(
+                pedido("lote", lote), pedido("grande_demais", grande_demais), pedido("pequeno", pequeno))
+        api._descartar_pool(api._pool)
+        return respostas, ordem
+
+    (lote, grande_demais, pequeno), ordem = asyncio.run(pedir())
+    assert lote[0] == 200 and len(lote[1]) == api.MAX_LOTE and lote[1][0]["resultado"]["x1"] == 2.0
+    # O status do PedidoInvalido volta do pool
+    assert grande_demais[0] == 413
+    assert pequeno == (200, {"resultado": {"delta": 1.0, "x1": 2.0, "x2": 1.0}})
+    assert ordem.index("pequeno") < ordem.index("lote")
@@ -0,0 +1,40 @@
+import os
+import threading
+import time
+
+import pytest
+
+import auth
+
+
+@pytest.fixture
+def vagas(monkeypatch):
+    vagas = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(auth, "_slots", vagas)
+    return vagas
+
+
+def test_hash_invalido_e_senha_errada():
+    assert auth.check_password("senha", "") is False
+    assert auth.check_password("senha", "não é bcrypt") is False
+
+
+def test_timeout_vira_ocupado_e_segura_a_vaga(vagas, monkeypatch):
+    monkeypatch.setattr(auth, "TIMEOUT", 0.05)
+    # Aquece o pool para o tempo de subir o processo não contar
+    auth._run(time.sleep, 0)
+
+    with pytest.raises(auth.AuthBusyError):
+        auth._run(time.sleep, 1)
+    # O trabalho ainda está rodando: a fila continua cheia
+    with pytest.raises(auth.AuthBusyError, match="cheia"):
+        auth._run(time.sleep, 0)
+
+    assert vagas.acquire(timeout=5)
+    vagas.release()
+
+
+def test_processo_morto_vira_ocupado_e_recria_o_pool(vagas):
+    with pytest.raises(auth.AuthBusyError):
+        auth._run(os._exit, 1)
+    assert auth.check_password("senha", auth.hash_password("senha", rounds=4))
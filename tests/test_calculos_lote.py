@@ -0,0 +1,82 @@
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import calculos_lote
+import formulas
+
+
+def _tabela(nome, n, semente=0):
+    aleatorio = random.Random(semente)
+    colunas = [entrada.nome for entrada in formulas.FORMULAS[nome].entradas]
+    # Zeros e números pequenos caem nos ramos de erro e nos casos especiais
+    valores = lambda: aleatorio.choice((0.0, -0.0, 1.0, aleatorio.uniform(-1e3, 1e3)))
+    return pd.DataFrame({col: [valores() for _ in range(n)] for col in colunas})
+
+
+def _mesmo(lote, escalar):
+    return escalar == pytest.approx(lote, rel=1e-12, abs=1e-300)
+
+
+@pytest.mark.parametrize("nome", list(calculos_lote.FORMULAS_LOTE))
+def test_lote_igual_ao_calculo_individual(nome):
+    tabela = _tabela(nome, 300)
+    saida = calculos_lote.calcular_lote(nome, tabela)
+    for linha, entrada in zip(saida.to_dict("records"), tabela.to_dict("records")):
+        try:
+            esperado = formulas.avaliar(nome, **entrada)
+        except (formulas.DominioError, ZeroDivisionError) as e:
+            assert linha["erro"] != "", (entrada, str(e))
+            continue
+        # Resultados com aviso (Δ < 0, velocidade imaginária) também são erro no lote
+        assert linha["erro"] == esperado.get("aviso", ""), entrada
+        for chave, valor in esperado.items():
+            if chave != "aviso":
+                assert _mesmo(linha[chave], valor), (entrada, chave)
+
+
+def test_celulas_vazias_ou_invalidas_dao_erro_na_linha():
+    csv = b"distancia,tempo\n10,2\n,2\nabc,1\n4,\n5,0\n"
+    saida = calculos_lote.calcular_lote("Velocidade Média", calculos_lote.ler_tabela("x.csv", csv))
+
+    assert list(saida["erro"]) == [
+        "",
+        "Valor ausente ou inválido: distancia",
+        "Valor ausente ou inválido: distancia",
+        "Valor ausente ou inválido: tempo",
+        "O tempo não pode ser zero!",
+    ]
+    assert saida["velocidade"][0] == 5
+    assert saida["velocidade"][1:].isna().all()
+
+
+def test_colunas_ausentes():
+    with pytest.raises(ValueError, match="Colunas ausentes: tempo"):
+        calculos_lote.calcular_lote("Velocidade Média", pd.DataFrame({"distancia": [1.0]}))
+
+
+@pytest.mark.parametrize("formato", ["csv", "parquet"])
+def test_exportar(formato):
+    csv = b"distancia,tempo\n10,2\nabc,1\n"
+    saida = calculos_lote.calcular_lote("Velocidade Média", calculos_lote.ler_tabela("x.csv", csv))
+    lido = calculos_lote.ler_tabela(f"r.{formato}", calculos_lote.exportar(saida, formato))
+
+    assert list(lido.columns) == ["distancia", "tempo", "velocidade", "erro"]
+    assert lido["velocidade"][0] == 5 and np.isnan(lido["velocidade"][1])
+    assert lido["erro"].fillna("").tolist() == ["", "Valor ausente ou inválido: distancia"]
+
+
+def test_bhaskara_lote_igual_ao_individual_nos_casos_limite():
+    # b² ≫ 4ac, b ou c zero (inclusive o sinal do zero) e Δ < 0
+    casos = [(1.5, 1e8, 0.75), (1.5, -1e8, 0.75), (1, 3, 0), (1, -3, 0), (2, 0, 0), (1, 0, -4), (-1, 2, -5)]
+    saida = calculos_lote.calcular_lote("Fórmula de Bhaskara", pd.DataFrame(casos, columns=["a", "b", "c"]))
+    for linha, (a, b, c) in zip(saida.to_dict("records"), casos):
+        esperado = formulas.avaliar("Fórmula de Bhaskara", a=a, b=b, c=c)
+        for chave, valor in esperado.items():
+            if chave == "aviso":
+                assert linha["erro"] == valor
+            else:
+                assert linha[chave] == valor and math.copysign(1, linha[chave]) == math.copysign(1, valor)
@@ -0,0 +1,93 @@
+import math
+import sys
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+import formulas
+
+BHASKARA = "Fórmula de Bhaskara"
+
+
+def _referencia(a, b, c):
+    r = formulas.avaliar_preciso(BHASKARA, 100, a=a, b=b, c=c)
+    return r["x1"], r["x2"]
+
+
+@pytest.mark.parametrize("b", [1e8, -1e8, 1e15, -3.5e12])
+def test_bhaskara_estavel_com_b_grande(b):
+    # b² ≫ 4ac: a fórmula de livro perde a raiz pequena por cancelamento
+    r = formulas.avaliar(BHASKARA, a=1.5, b=b, c=0.75)
+    for valor, esperado in zip((r["x1"], r["x2"]), _referencia(1.5, b, 0.75)):
+        assert abs((Decimal(valor) - esperado) / esperado) < Decimal("1e-15")
+    # x1 continua sendo a raiz com +√Δ (a maior, já que a > 0)
+    assert r["x1"] > r["x2"]
+
+
+def test_bhaskara_a_zero():
+    with pytest.raises(formulas.DominioError, match="a não pode ser zero"):
+        formulas.avaliar(BHASKARA, a=0, b=2, c=1)
+    with pytest.raises(formulas.DominioError):
+        formulas.avaliar_preciso(BHASKARA, a=0, b=2, c=1)
+
+
+@pytest.mark.parametrize("a, b, c, real", [(1, 2, 5, -1.0), (-1, 2, -5, 1.0)])
+def test_bhaskara_raizes_complexas(a, b, c, real):
+    r = formulas.avaliar(BHASKARA, a=a, b=b, c=c)
+    assert r == {"delta": -16.0, "aviso": "Não existem raízes reais.", "real": real, "imaginaria": 2.0}
+    assert "x1" not in r
+
+
+def test_bhaskara_c_zero_nao_devolve_zero_negativo():
+    # Pela forma estável a raiz nula sairia de c/q = 0/(-3) = -0.0
+    r = formulas.avaliar(BHASKARA, a=1, b=3, c=0)
+    assert (r["x1"], r["x2"]) == (0.0, -3.0)
+    assert math.copysign(1, r["x1"]) == 1
+
+
+def test_bhaskara_b_e_c_zero_sem_divisao_por_zero():
+    # Pela forma estável seria c/q com q = 0
+    r = formulas.avaliar(BHASKARA, a=2, b=0, c=0)
+    assert r["delta"] == 0 and r["x1"] == 0 and r["x2"] == 0
+    assert formulas.avaliar(BHASKARA, a=1, b=0, c=-4) == {"delta": 16.0, "x1": 2.0, "x2": -2.0}
+
+
+def test_preciso_respeita_os_digitos():
+    r = formulas.avaliar_preciso("Velocidade Média", 50, distancia="0.1", tempo=3)
+    assert r["velocidade"] == Decimal("0." + "0" + "3" * 50)
+    assert len(r["velocidade"].as_tuple().digits) == 50
+
+    # Entradas pelo texto ou Fraction são exatas: 0.1 não vira o binário mais próximo
+    assert formulas.avaliar_preciso("Força Resultante", 30, massa=0.1, aceleracao=3)["forca"] == Decimal("0.3")
+    terco = formulas.avaliar_preciso("Área do Quadrado", 40, lado=Fraction(1, 3))["area"]
+    assert terco == Decimal("0." + "1" * 40)
+
+
+def test_preciso_bhaskara_produto_das_raizes():
+    r = formulas.avaliar_preciso(BHASKARA, 60, a=1, b="1e20", c=1)
+    # x1·x2 = c/a, mesmo com b² ≫ 4ac
+    assert abs(r["x1"] * r["x2"] - 1) < Decimal("1e-55")
+    # x1 = -c/b - a·c²/b³ - ...; o termo seguinte (2e-100) já fica abaixo dos 60 algarismos
+    assert r["x1"] == Decimal("-1." + "0" * 39 + "1E-20")
+
+
+@pytest.mark.parametrize("valores, mensagem", [
+    (["d=abc", "v=1"], "valor não numérico para d: abc"),
+    (["d=1"], "entradas ausentes: v"),
+    (["d", "v=1"], "use nome=valor: d"),
+])
+def test_cli_entrada_invalida(monkeypatch, capsys, valores, mensagem):
+    monkeypatch.setattr(sys, "argv", ["formulas.py", "Tempo", *valores])
+    with pytest.raises(SystemExit) as saida:
+        formulas.main()
+    assert saida.value.code == 2
+    assert mensagem in capsys.readouterr().err
+
+
+def test_cli_erro_de_dominio(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["formulas.py", "Tempo", "d=4", "v=0"])
+    with pytest.raises(SystemExit) as saida:
+        formulas.main()
+    assert saida.value.code == 1
+    assert "A velocidade não pode ser zero!" in capsys.readouterr().err
@@ -0,0 +1,70 @@
+import json
+import os
+import time
+
+import notificacoes
+
+
+def test_reenvio_depois_de_vencido(pasta):
+    fila = notificacoes.FilaNotificacoes("notificacoes", ttl=0.2)
+    assert fila.enviar("friend_request", "a", "b")
+    assert not fila.enviar("friend_request", "a", "b")
+
+    time.sleep(0.3)
+    assert fila.pendentes("b") == []
+    assert fila.enviar("friend_request", "a", "b")
+    assert [n["from"] for n in fila.pendentes("b")] == ["a"]
+
+    # O ts renovado também vale depois de reler o log
+    fila.esperar()
+    outra = notificacoes.FilaNotificacoes("notificacoes", ttl=0.2)
+    assert [n["from"] for n in outra.pendentes("b")] == ["a"]
+
+
+def test_compactar_inclui_eventos_de_outro_processo(pasta):
+    fila = notificacoes.FilaNotificacoes("notificacoes")
+    fila.enviar("friend_request", "a", "b")
+    fila.esperar()
+
+    # Outro processo acrescenta um evento que esta fila ainda não leu
+    outro = {"op": "add", "type": "friend_request", "from": "c", "to": "b", "ts": time.time()}
+    with open(fila.log_path, "a") as f:
+        f.write(json.dumps(outro) + "\n")
+
+    fila.compactar()
+    with open(fila.index_path) as f:
+        dados = json.load(f)
+    assert sorted(n["from"] for n in dados["b"]) == ["a", "c"]
+
+
+def test_falha_de_gravacao_nao_trava_a_fila(pasta, monkeypatch):
+    monkeypatch.setattr(notificacoes, "TENTATIVAS_GRAVACAO", 2)
+    fila = notificacoes.FilaNotificacoes("notificacoes")
+
+    def sem_espaco(caminho, modo="r", *args, **kwargs):
+        if modo == "ab":
+            raise OSError(28, "No space left on device")
+        return open(caminho, modo, *args, **kwargs)
+
+    monkeypatch.setattr(notificacoes, "open", sem_espaco, raising=False)
+    fila.enviar("friend_request", "a", "b")
+    fila.esperar()
+    assert [n["from"] for n in fila.pendentes("b")] == ["a"]
+
+    # A thread continua viva e volta a gravar quando o disco volta
+    monkeypatch.delattr(notificacoes, "open")
+    fila.enviar("friend_request", "c", "b")
+    fila.esperar()
+    with open(fila.log_path) as f:
+        assert [json.loads(linha)["from"] for linha in f] == ["c"]
+
+
+def test_escrita_espera_a_compactacao_de_outro_processo(pasta):
+    compactando = notificacoes.FilaNotificacoes("notificacoes")
+    outra = notificacoes.FilaNotificacoes("notificacoes")
+    with compactando._lock, compactando._travar_arquivo(exclusivo=True):
+        outra.enviar("friend_request", "a", "b")
+        time.sleep(0.2)
+        assert not os.path.exists(outra.log_path)
+    outra.esperar()
+    assert [n["from"] for n in compactando.pendentes("b")] == ["a"]
@@ -0,0 +1,84 @@
+import random
+
+import amigos
+import registros
+import storage
+
+
+def _usuarios(n, semente=0):
+    aleatorio = random.Random(semente)
+    users = {}
+    for i in range(n):
+        user_id = f"id{i}"
+        amigos_ids = list(dict.fromkeys(f"id{aleatorio.randrange(n + 5)}" for _ in range(aleatorio.randrange(6))))
+        users[user_id] = {
+            "id": user_id, "username": f"u{i}", "password": f"$2b$04${i}",
+            "amigos": amigos_ids, "notificacoes": [], "anotacao": f"nota {i}",
+        }
+    return users
+
+
+def test_tabela_igual_aos_registros(pasta):
+    users = _usuarios(200)
+    backend = storage.JsonBackend()
+    backend.save_all(users)
+
+    tabela = registros.TabelaUsuarios(backend)
+    assert len(tabela) == len(users)
+    assert sorted(u.id for u in tabela) == sorted(users)
+    for user_id, user in users.items():
+        assert tabela.usuario(user_id).to_dict() == user
+        assert tabela.por_username(user["username"]).id == user_id
+    # Amigos que não existem (id200..id204) não viram usuários
+    assert "id203" not in tabela and tabela.usuario("id203") is None
+
+
+def test_adjacencia_de_dict():
+    adjacencia = registros.Adjacencia.de_dict({"a": ["b", "c"], "b": ["a"], "d": []})
+    assert adjacencia.total == 3
+    assert dict(adjacencia) == {"a": ["b", "c"], "b": ["a"], "d": []}
+    assert adjacencia.amigos("c") == []
+
+
+def test_adjacencia_grau_fatia_e_contem():
+    aleatorio = random.Random(3)
+    # Uma lista pequena (busca linear) e uma grande (busca binária)
+    muitos = [f"id{i}" for i in aleatorio.sample(range(1000), 500)]
+    adjacencia = registros.Adjacencia.de_dict({"a": ["b", "c"], "b": ["a"], "z": muitos})
+
+    assert adjacencia.grau("a") == 2 and adjacencia.grau("z") == 500
+    assert adjacencia.grau("c") == 0 and adjacencia.grau("nenhum") == 0
+    assert adjacencia.amigos("z", 100, 50) == muitos[100:150]
+    assert adjacencia.amigos("z", 490, 50) == muitos[490:]
+    assert adjacencia.amigos("a", 5, 50) == []
+    assert adjacencia.contem("a", "c") and not adjacencia.contem("a", "z")
+    for i in range(1000):
+        assert adjacencia.contem("z", f"id{i}") == (f"id{i}" in muitos)
+    assert not adjacencia.contem("z", "a") and not adjacencia.contem("c", "a")
+
+
+def test_grafo_acompanha_escritas(pasta, monkeypatch):
+    monkeypatch.setattr(amigos, "INTERVALO_GRAVACAO", 3600)
+    users = _usuarios(100, semente=1)
+    backend = storage.JsonBackend()
+    backend.save_all(users)
+    grafo = amigos.FriendGraph(backend)
+
+    aleatorio = random.Random(2)
+    for rodada in range(50):
+        a, b = (f"id{aleatorio.randrange(100)}" for _ in range(2))
+        with backend.transaction([a, b]) as records:
+            records[a]["amigos"].append(b)
+            records[b]["amigos"].append(a)
+        for user_id, user in records.items():
+            users[user_id] = user
+        if rodada % 10 == 0:
+            grafo.gravar_pendente()
+        for user_id, user in users.items():
+            esperado = list(dict.fromkeys(user["amigos"]))
+            assert grafo.amigos(user_id) == esperado
+            assert grafo.total(user_id) == len(esperado)
+            assert grafo.pagina(user_id, 1, 2) == esperado[:2]
+            assert grafo.pagina(user_id, 2, 2) == esperado[2:4]
+            assert all(grafo.sao_amigos(user_id, amigo) for amigo in esperado)
+            assert not grafo.sao_amigos(user_id, "id1000")
@@ -0,0 +1,145 @@
+import json
+import os
+
+import storage
+
+
+def _usuario(user_id, username):
+    return {"id": user_id, "username": username, "password": "x", "amigos": [], "notificacoes": [], "anotacao": ""}
+
+
+def _tocar(path):
+    # Garante que version() mude mesmo numa escrita no mesmo instante
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_json_consultas_usam_memoria(pasta, monkeypatch):
+    backend = storage.JsonBackend()
+    backend.save_all({"a": _usuario("a", "ana")})
+    assert backend.find_id("ana") == "a"
+    assert backend.get("a")["username"] == "ana"
+
+    leituras = []
+    original = backend.load_all
+    monkeypatch.setattr(backend, "load_all", lambda: leituras.append(1) or original())
+    for _ in range(10):
+        assert backend.find_id("ana") == "a"
+        assert backend.get("a")["username"] == "ana"
+    assert leituras == []
+
+
+def test_json_get_devolve_copia(pasta):
+    backend = storage.JsonBackend()
+    backend.save_all({"a": _usuario("a", "ana")})
+    backend.get("a")["anotacao"] = "alterada"
+    assert backend.get("a")["anotacao"] == ""
+
+
+def test_json_ve_escrita_de_outro_processo(pasta):
+    backend = storage.JsonBackend()
+    backend.save_all({"a": _usuario("a", "ana")})
+    assert backend.find_id("ana") == "a"
+
+    outro = storage.JsonBackend()
+    with outro.transaction(["a"]) as records:
+        records["a"]["username"] = "bia"
+    _tocar(storage.USERS_FILE)
+
+    assert backend.find_id("ana") is None
+    assert backend.find_id("bia") == "a"
+
+
+class _Intercalado:
+    """Backend que roda `no_meio` entre a leitura e a volta de get_many/find_id."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.no_meio = None
+
+    def __getattr__(self, nome):
+        return getattr(self.backend, nome)
+
+    def _depois_de_ler(self):
+        acao, self.no_meio = self.no_meio, None
+        if acao:
+            acao()
+
+    def get_many(self, user_ids):
+        records = self.backend.get_many(user_ids)
+        self._depois_de_ler()
+        return records
+
+    def find_id(self, username):
+        user_id = self.backend.find_id(username)
+        self._depois_de_ler()
+        return user_id
+
+
+def test_cache_nao_guarda_leitura_anterior_a_escrita(pasta):
+    interno = _Intercalado(storage.JsonBackend())
+    interno.save_all({"x": _usuario("x", "xavier") | {"anotacao": "v1"}})
+    cache = storage.CachedBackend(interno)
+
+    def escrever_v2():
+        with cache.transaction(["x"]) as records:
+            records["x"]["anotacao"] = "v2"
+
+    # A leitura perdida devolve v1, mas o cache não pode ficar com ela
+    interno.no_meio = escrever_v2
+    assert cache.get("x")["anotacao"] == "v1"
+    assert interno.get("x")["anotacao"] == "v2"
+    assert cache.get("x")["anotacao"] == "v2"
+
+
+def test_cache_nao_guarda_username_anterior_a_escrita(pasta):
+    interno = _Intercalado(storage.JsonBackend())
+    interno.save_all({"x": _usuario("x", "xavier")})
+    cache = storage.CachedBackend(interno)
+
+    def renomear():
+        with cache.transaction(["x"]) as records:
+            records["x"]["username"] = "outro"
+
+    interno.no_meio = renomear
+    cache.find_id("xavier")
+    cache.find_id("xavier")
+    assert cache.find_id("outro") == "x"
+    assert interno.find_id("xavier") is None
+    assert cache.find_id("xavier") is None
+
+
+def test_json_indice_em_disco_evita_ler_usuarios(pasta, monkeypatch):
+    storage.JsonBackend().save_all({"a": _usuario("a", "ana")})
+
+    def nao_ler(self):
+        raise AssertionError("users.json não deveria ser lido")
+
+    monkeypatch.setattr(storage.JsonBackend, "load_all", nao_ler)
+    assert storage.JsonBackend().find_id("ana") == "a"
+
+
+def test_json_indice_desatualizado_e_refeito(pasta):
+    storage.JsonBackend().save_all({"a": _usuario("a", "ana")})
+    # Formato antigo (só o mapa) ou de outra versão do users.json
+    with open(storage.USERNAME_INDEX_FILE, "w") as f:
+        json.dump({"fantasma": "x"}, f)
+
+    backend = storage.JsonBackend()
+    assert backend.find_id("fantasma") is None
+    assert backend.find_id("ana") == "a"
+    with open(storage.USERNAME_INDEX_FILE) as f:
+        dados = json.load(f)
+    assert dados == {"versao": list(backend.version()), "usuarios": {"ana": "a"}}
+
+
+def test_cache_esquece_username_trocado(pasta):
+    cache = storage.CachedBackend(storage.JsonBackend())
+    cache.save_all({"x": _usuario("x", "xavier")})
+    assert cache.find_id("xavier") == "x"
+
+    with cache.transaction(["x"]) as records:
+        records["x"]["username"] = "outro"
+
+    assert cache.find_id("outro") == "x"
+    assert cache.find_id("xavier") is None